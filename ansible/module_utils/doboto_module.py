@@ -2,8 +2,21 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
+import copy
+import json
 import time
-from ansible.module_utils.basic import AnsibleModule
+import fcntl
+import random
+import sys
+import socket
+import hashlib
+import tempfile
+import threading
+import contextlib
+import subprocess
+from multiprocessing.pool import ThreadPool
+from ansible.module_utils.basic import AnsibleModule, _load_params
 
 """
 Ansible util for DigitalOcean DOBOTO modules
@@ -25,12 +38,115 @@ along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+try:
+    import requests
+    import doboto.Endpoint
     from doboto.DO import DO
     from doboto.exception import DOBOTOException, DOBOTONotFoundException, DOBOTOPollingException
     HAS_DOBOTO = True
 except:
     HAS_DOBOTO = False
 
+try:
+    import jmespath
+    HAS_JMESPATH = True
+except ImportError:
+    HAS_JMESPATH = False
+
+CACHE_DIR = os.environ.get("DOBOTO_CACHE_DIR", os.path.expanduser("~/.doboto/cache"))
+CACHE_SIZE = 16 * 1024 * 1024
+CACHE_TTL = 300
+
+VALIDATE = os.environ.get("DOBOTO_VALIDATE", "0") not in ["0", "false", "no", "off"]
+VALIDATE_DIR = "validators"
+VALIDATE_SIZE = 4 * 1024 * 1024
+VALIDATE_TTL = 86400
+VALIDATE_EVICT = 0.05
+
+RATE_LIMIT = os.environ.get("DOBOTO_RATE_LIMIT", "1") not in ["0", "false", "no", "off"]
+RATE_LIMIT_DIR = os.environ.get("DOBOTO_RATE_LIMIT_DIR", os.path.expanduser("~/.doboto/rate_limit"))
+RATE_LIMIT_LIMIT = 5000
+RATE_LIMIT_WINDOW = 3600
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_LOW = 0.2
+
+POLL_FIRST = 1
+POLL_BACKOFF = 1.5
+POLL_JITTER = 0.2
+
+# Rough seconds each kind of wait usually takes, so polling can skip checks bound to fail
+
+POLL_HINTS = {
+    "droplet_create": 30,
+    "load_balancer_create": 60,
+    "load_balancer_update": 10,
+    "load_balancer_cutover": 10,
+    "volume_create": 3,
+    "floating_ip_create": 4,
+    "power_on": 10,
+    "power_off": 10,
+    "shutdown": 20,
+    "reboot": 20,
+    "power_cycle": 20,
+    "password_reset": 20,
+    "resize": 60,
+    "rebuild": 60,
+    "restore": 60,
+    "rename": 2,
+    "change_kernel": 2,
+    "enable_ipv6": 5,
+    "enable_private_networking": 5,
+    "enable_backups": 2,
+    "disable_backups": 2,
+    "snapshot": 60,
+    "convert": 60,
+    "transfer": 120,
+    "attach_volume": 4,
+    "detach_volume": 4,
+    "resize_volume": 4,
+    "assign_ip": 4,
+    "unassign_ip": 4
+}
+
+BATCH_CONCURRENCY = 4
+
+# Most items to send per request when sending many, and how many times to send each chunk
+
+CHUNK_SIZE = 100
+CHUNK_ATTEMPTS = 3
+
+# Past this many in-progress actions, refresh them from pages of recent actions rather than one
+# at a time, looking through at most this many pages
+
+WAIT_LIST = 5
+WAIT_PAGES = 3
+
+METRICS_IDS = re.compile(
+    r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+\.\d+\.\d+\.\d+)$"
+)
+
+PAGE_SIZE = 200
+PAGING = ["limit", "page", "per_page", "stop"]
+
+PROJECT_ACTIONS = re.compile(r"^(\w+_)?(list|info)$")
+
+WORKER = os.environ.get("DOBOTO_WORKER")
+WORKER_PATH = os.path.expanduser("~/.doboto/worker.sock")
+WORKER_IDLE = int(os.environ.get("DOBOTO_WORKER_IDLE", 60))
+
+# Requests that can safely be sent again when it's not known whether the worker sent them
+
+WORKER_IDEMPOTENT = ["GET", "HEAD", "OPTIONS"]
+
+WORKER_SERVE = (
+    "import sys; from ansible.module_utils.doboto_module import Worker; "
+    "Worker(sys.argv[1], int(sys.argv[2])).serve()"
+)
+
 
 def require(*required):
     def requirer(function):
@@ -49,14 +165,983 @@ def require(*required):
     return requirer
 
 
+class Cache(object):
+    """
+    Size bounded, least recently used, on disk cache of API results shared across module runs
+    """
+
+    def __init__(self, directory=CACHE_DIR, size=CACHE_SIZE, evict_chance=1):
+        self.directory = directory
+        self.size = size
+        self.evict_chance = evict_chance
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def path(self, key, extension="json"):
+        return os.path.join(self.directory, "%s.%s" % (key, extension))
+
+    def get(self, key, ttl):
+        """
+        Returns a (found, value) tuple, found being False if missing or older than ttl seconds
+        """
+
+        path = self.path(key)
+
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return (False, None)
+
+        if time.time() - entry["stored"] > ttl:
+            return (False, None)
+
+        # Modified time tracks use for eviction, the stored time tracks age
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return (True, entry["value"])
+
+    def set(self, key, value):
+
+        try:
+
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, 0o700)
+
+            (handle, temp_path) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+            with os.fdopen(handle, 'w') as entry_file:
+                json.dump({"stored": time.time(), "value": value}, entry_file)
+
+            os.rename(temp_path, self.path(key))
+
+            # Eviction lists the whole directory, so frequent writers only do it now and again
+
+            if random.random() < self.evict_chance:
+                self.evict()
+
+        except (IOError, OSError):
+            pass
+
+    def delete(self, key):
+
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.directory):
+
+            if not name.endswith(".json"):
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for (used, size, path) in sorted(entries):
+
+            if total <= self.size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            try:
+                os.remove(path[:-len("json")] + "lock")
+            except OSError:
+                pass
+
+            total -= size
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """
+        Serializes fetching a key across processes so concurrent forks don't all hit the API
+        """
+
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, 0o700)
+            lock_file = open(self.path(key, "lock"), 'a')
+        except (IOError, OSError):
+            yield
+            return
+
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+class Response(object):
+    """
+    The parts of a requests response doboto uses, for responses relayed by the worker
+    """
+
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.text = text
+        self.content = text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class Validators(object):
+    """
+    Keeps the ETag and Last-Modified of GET responses along with their bodies, so a repeat can be
+    sent as a conditional request and the body of a 304 answered from here
+    """
+
+    def __init__(self, directory=CACHE_DIR, size=VALIDATE_SIZE):
+        self.cache = Cache(os.path.join(directory, VALIDATE_DIR), size, VALIDATE_EVICT)
+
+    @staticmethod
+    def key(url, params, headers):
+        return Cache.key(
+            hashlib.sha256((headers or {}).get("Authorization", "").encode('utf-8')).hexdigest(),
+            url, params or {}
+        )
+
+    def conditions(self, key):
+        """
+        Returns the stored response and the headers to make a request conditional on it
+        """
+
+        (found, stored) = self.cache.get(key, VALIDATE_TTL)
+
+        if not found:
+            return (None, {})
+
+        conditions = {}
+
+        if stored["etag"]:
+            conditions["If-None-Match"] = stored["etag"]
+
+        if stored["last_modified"]:
+            conditions["If-Modified-Since"] = stored["last_modified"]
+
+        return (stored, conditions)
+
+    def store(self, key, response):
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        if etag or last_modified:
+            self.cache.set(key, {
+                "etag": etag,
+                "last_modified": last_modified,
+                "text": response.text
+            })
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """
+    Relays line delimited JSON requests over the warm session for their token
+    """
+
+    def handle(self):
+
+        while True:
+
+            line = self.rfile.readline()
+
+            if not line:
+                return
+
+            self.server.touch(1)
+
+            try:
+                relay = json.loads(line.decode('utf-8'))
+                response = self.server.session(relay["headers"]).request(
+                    relay["method"], relay["url"],
+                    params=relay["params"], data=relay["data"],
+                    headers=relay["headers"], timeout=relay["timeout"]
+                )
+                reply = {
+                    "status_code": response.status_code,
+                    "headers": dict(response.headers),
+                    "text": response.text
+                }
+            except Exception as exception:
+                reply = {"error": str(exception)}
+            finally:
+                self.server.touch(-1)
+
+            self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long lived local process keeping a keep-alive session per token, exiting once idle
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, idle):
+        socketserver.UnixStreamServer.__init__(self, path, WorkerHandler)
+        self.idle = idle
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.active = 0
+        self.used = time.time()
+
+    def session(self, headers):
+
+        key = hashlib.sha256(headers.get("Authorization", "").encode('utf-8')).hexdigest()
+
+        with self.lock:
+            if key not in self.sessions:
+                self.sessions[key] = requests.Session()
+            return self.sessions[key]
+
+    def touch(self, active):
+        with self.lock:
+            self.active += active
+            self.used = time.time()
+
+    def reaper(self):
+
+        while True:
+            time.sleep(1)
+            with self.lock:
+                if self.active == 0 and time.time() - self.used > self.idle:
+                    break
+
+        self.shutdown()
+
+
+class WorkerUnavailable(Exception):
+    """
+    Raised when a request couldn't be handed to the worker, so it's safe to send it another way
+    """
+
+
+class Worker(object):
+    """
+    Client to the persistent worker, spawning it if it isn't running
+    """
+
+    def __init__(self, path=WORKER_PATH, idle=WORKER_IDLE):
+        self.path = path
+        self.idle = idle
+        self.local = threading.local()
+
+    def connect(self):
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            connection.connect(self.path)
+        except socket.error:
+            connection.close()
+            return None
+
+        return (connection, connection.makefile('rb'))
+
+    def spawn(self):
+
+        directory = os.path.dirname(self.path)
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+
+        with open(self.path + ".lock", 'a') as lock_file:
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # Someone else may have started it while we waited for the lock
+
+            connected = self.connect()
+
+            if connected is not None:
+                return connected
+
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+            # A fresh interpreter rather than a fork, as this process may already have threads
+
+            with open(os.devnull, 'r+') as null:
+                subprocess.Popen(
+                    [sys.executable, "-c", WORKER_SERVE, self.path, str(self.idle)],
+                    stdin=null, stdout=null, stderr=null, close_fds=True,
+                    env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+                )
+
+            start_time = time.time()
+
+            while time.time() - start_time < 5:
+
+                connected = self.connect()
+
+                if connected is not None:
+                    return connected
+
+                time.sleep(0.05)
+
+        return None
+
+    def serve(self):
+        """
+        Detaches from the module process (so Ansible isn't left waiting on it) and serves
+        """
+
+        try:
+
+            os.setsid()
+
+            server = WorkerServer(self.path, self.idle)
+
+            reaper = threading.Thread(target=server.reaper)
+            reaper.daemon = True
+            reaper.start()
+
+            try:
+                server.serve_forever(poll_interval=0.5)
+            finally:
+                server.server_close()
+                os.remove(self.path)
+
+        finally:
+            os._exit(0)
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        """
+        Relays the request through the worker, raising WorkerUnavailable only when it's certain
+        the worker never got it, and never sending anything but idempotent requests twice
+        """
+
+        relay = (json.dumps({
+            "method": method, "url": url, "params": params, "data": data,
+            "headers": headers, "timeout": timeout
+        }) + "\n").encode('utf-8')
+
+        idempotent = method.upper() in WORKER_IDEMPOTENT
+
+        # A cached connection may have been closed by an idle worker without us knowing, which
+        # looks the same as the worker going away after sending, so others get a fresh one
+
+        if not idempotent and getattr(self.local, "connected", None) is not None:
+            self.local.connected[0].close()
+            self.local.connected = None
+
+        for attempt in range(2 if idempotent else 1):
+
+            if getattr(self.local, "connected", None) is None:
+                self.local.connected = self.connect() or self.spawn()
+
+            if self.local.connected is None:
+                raise WorkerUnavailable("unable to reach the doboto worker")
+
+            (connection, reader) = self.local.connected
+
+            # The worker only acts on a whole line, so a failed send never reached the API
+
+            try:
+                connection.sendall(relay)
+            except socket.error:
+                connection.close()
+                self.local.connected = None
+                if idempotent:
+                    continue
+                raise WorkerUnavailable("unable to send to the doboto worker")
+
+            try:
+                line = reader.readline()
+            except socket.error:
+                line = None
+
+            if line:
+                break
+
+            connection.close()
+            self.local.connected = None
+
+            if not idempotent:
+                raise requests.exceptions.ConnectionError(
+                    "lost the doboto worker after sending %s %s" % (method, url)
+                )
+
+        else:
+            raise WorkerUnavailable("lost the doboto worker")
+
+        reply = json.loads(line.decode('utf-8'))
+
+        if "error" in reply:
+            raise requests.exceptions.ConnectionError(reply["error"])
+
+        return Response(reply["status_code"], reply["headers"], reply["text"])
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every process using a token through a file locked state file,
+    kept in line with the RateLimit-* headers the API sends back
+
+    The state file only exists while the API reports less than RATE_LIMIT_LOW of the budget
+    remaining, so until then requests go out without touching it
+    """
+
+    def __init__(self, directory=RATE_LIMIT_DIR):
+        self.directory = directory
+
+    def path(self, headers):
+        key = hashlib.sha256((headers or {}).get("Authorization", "").encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, "%s.json" % key)
+
+    @contextlib.contextmanager
+    def state(self, headers):
+        """
+        Yields the state dict for the token with an exclusive lock, saving it afterwards
+        """
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, 0o700)
+
+        with open(self.path(headers), 'a+') as state_file:
+
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+
+            try:
+
+                state_file.seek(0)
+
+                try:
+                    state = json.loads(state_file.read())
+                except ValueError:
+                    state = {
+                        "limit": RATE_LIMIT_LIMIT,
+                        "tokens": RATE_LIMIT_LIMIT,
+                        "updated": time.time(),
+                        "blocked": 0
+                    }
+
+                now = time.time()
+
+                state["tokens"] = min(
+                    state["limit"],
+                    state["tokens"] + (now - state["updated"]) * state["limit"] / RATE_LIMIT_WINDOW
+                )
+                state["updated"] = now
+
+                yield state
+
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def acquire(self, headers):
+        """
+        Blocks until the bucket has a request to spend, returning the seconds waited
+        """
+
+        if not os.path.exists(self.path(headers)):
+            return 0
+
+        waited = 0
+
+        while True:
+
+            with self.state(headers) as state:
+
+                if state["blocked"] > state["updated"]:
+                    wait = state["blocked"] - state["updated"]
+                elif state["tokens"] >= 1:
+                    state["tokens"] -= 1
+                    return waited
+                else:
+                    wait = (1 - state["tokens"]) * RATE_LIMIT_WINDOW / state["limit"]
+
+            time.sleep(wait)
+            waited += wait
+
+    def update(self, headers, response):
+        """
+        Trusts the API's count when lower than ours, as other clients may share the budget
+        """
+
+        if "RateLimit-Remaining" not in response.headers and response.status_code != 429:
+            return
+
+        try:
+            limit = int(response.headers.get("RateLimit-Limit", RATE_LIMIT_LIMIT))
+            remaining = int(response.headers.get("RateLimit-Remaining", 0))
+            reset = float(response.headers.get("RateLimit-Reset", 0))
+        except ValueError:
+            return
+
+        # Plenty left, so stop pacing everyone
+
+        if response.status_code != 429 and remaining >= limit * RATE_LIMIT_LOW:
+            try:
+                os.remove(self.path(headers))
+            except OSError:
+                pass
+            return
+
+        with self.state(headers) as state:
+
+            state["limit"] = limit
+            state["tokens"] = min(state["tokens"], remaining)
+
+            if response.status_code == 429:
+                state["tokens"] = 0
+                state["blocked"] = max(reset, state["updated"] + 1)
+
+
+def pick(value, fields):
+    """
+    Keeps only fields of value, or of each item if it's a list, with dots reaching into nested dicts
+    """
+
+    if isinstance(value, list):
+        return [pick(item, fields) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    nested = {}
+
+    for field in fields:
+        (name, dot, rest) = field.partition(".")
+        nested.setdefault(name, []).append(rest if dot else None)
+
+    return {
+        name: value[name] if None in rests else pick(value[name], rests)
+        for (name, rests) in nested.items() if name in value
+    }
+
+
+def progress(actions):
+    """
+    Counts actions by status, so a wait over many of them shows how far along it got
+    """
+
+    counts = {"completed": 0, "in_progress": 0, "errored": 0}
+
+    for action in actions:
+        if isinstance(action, dict) and "status" in action:
+            status = action["status"].replace("-", "_")
+            counts[status] = counts.get(status, 0) + 1
+
+    return counts
+
+
+def failure(exception):
+    """
+    Returns what a DOBOTO exception says went wrong, as only API errors carry a result and the
+    others can't always be turned into strings
+    """
+
+    if isinstance(exception, DOBOTONotFoundException):
+        return "not found"
+
+    if isinstance(exception, DOBOTOPollingException):
+        if exception.error is not None:
+            return "timed out after %s" % exception.error
+        return "timed out"
+
+    if getattr(exception, "result", None) is not None:
+        return exception.result
+
+    return exception.args[0] if exception.args else exception.__class__.__name__
+
+
+class Metrics(object):
+    """
+    Counts what one module invocation did against the API, bound to threads by the Transport
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.seconds = 0.0
+        self.throttled = 0.0
+        self.polls = 0
+        self.waited = 0.0
+        self.not_modified = 0
+        self.endpoints = {}
+
+    @staticmethod
+    def endpoint(method, url):
+        """
+        Names an endpoint by method and path, with ids swapped out so calls group together
+        """
+
+        path = url.split("?", 1)[0].split("://", 1)[-1].split("/", 1)[-1]
+
+        return "%s /%s" % (method, "/".join(
+            ":id" if METRICS_IDS.match(part) else part for part in path.split("/")[1:]
+        ))
+
+    def request(self, method, url, data, response, seconds):
+
+        endpoint = self.endpoint(method, url)
+
+        with self.lock:
+
+            self.requests += 1
+            self.seconds += seconds
+            self.bytes_out += len(data or "")
+            self.bytes_in += len(response.content or "") if response is not None else 0
+
+            timing = self.endpoints.setdefault(endpoint, {"requests": 0, "seconds": 0.0, "max": 0.0})
+            timing["requests"] += 1
+            timing["seconds"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    def retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def validated(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def throttle(self, seconds):
+        with self.lock:
+            self.throttled += seconds
+
+    def poll(self, seconds):
+        with self.lock:
+            self.polls += 1
+            self.waited += seconds
+
+    def report(self):
+
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "not_modified": self.not_modified,
+                "bytes_out": self.bytes_out,
+                "bytes_in": self.bytes_in,
+                "seconds": round(self.seconds, 3),
+                "throttled": round(self.throttled, 3),
+                "polls": self.polls,
+                "waited": round(self.waited, 3),
+                "endpoints": {
+                    endpoint: {
+                        "requests": timing["requests"],
+                        "seconds": round(timing["seconds"], 3),
+                        "max": round(timing["max"], 3)
+                    }
+                    for (endpoint, timing) in self.endpoints.items()
+                }
+            }
+
+    def add(self, report):
+        """
+        Folds another invocation's report into this one
+        """
+
+        with self.lock:
+
+            for field in ["requests", "retries", "not_modified", "bytes_out", "bytes_in", "polls"]:
+                setattr(self, field, getattr(self, field) + report.get(field, 0))
+
+            for field in ["seconds", "throttled", "waited"]:
+                setattr(self, field, getattr(self, field) + report.get(field, 0.0))
+
+            for (endpoint, timing) in report.get("endpoints", {}).items():
+                total = self.endpoints.setdefault(
+                    endpoint, {"requests": 0, "seconds": 0.0, "max": 0.0}
+                )
+                total["requests"] += timing["requests"]
+                total["seconds"] += timing["seconds"]
+                total["max"] = max(total["max"], timing["max"])
+
+    def wrap(self, exit):
+        """
+        Returns exit_json or fail_json with this report added to the result
+        """
+
+        def wrapper(*args, **kwargs):
+            kwargs["doboto_metrics"] = self.report()
+            return exit(*args, **kwargs)
+
+        return wrapper
+
+
+class Transport(object):
+    """
+    Stands in for the requests module within doboto so every API call goes through one place
+    """
+
+    def __init__(self, worker=None, limiter=None, validators=None):
+        self.worker = worker
+        self.limiter = limiter
+        self.validators = validators
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def measure(self, metrics, validators=None):
+        """
+        Counts this thread's API calls in metrics while in the block, validating its GETs with
+        validators if given rather than the process' own
+        """
+
+        previous = (getattr(self.local, "metrics", None), getattr(self.local, "validators", None))
+        (self.local.metrics, self.local.validators) = (metrics, validators)
+
+        try:
+            yield metrics
+        finally:
+            (self.local.metrics, self.local.validators) = previous
+
+    def session(self):
+
+        if getattr(self.local, "session", None) is None:
+            self.local.session = requests.Session()
+
+        return self.local.session
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+
+        validators = getattr(self.local, "validators", None) or self.validators
+
+        if method == "GET" and validators is not None:
+            return self.validated(validators, url, params, data, headers, timeout)
+
+        return self.limited(method, url, params, data, headers, timeout)
+
+    def validated(self, validators, url, params=None, data=None, headers=None, timeout=None):
+        """
+        Sends a GET conditional on the copy we have, if any, serving that copy's body with the
+        304's own headers, so the RateLimit-* ones are current
+        """
+
+        key = Validators.key(url, params, headers)
+        (stored, conditions) = validators.conditions(key)
+
+        response = self.limited("GET", url, params, data, dict(headers or {}, **conditions), timeout)
+
+        if response.status_code == 304 and stored is not None:
+            metrics = getattr(self.local, "metrics", None)
+            if metrics is not None:
+                metrics.validated()
+            return Response(200, response.headers, stored["text"])
+
+        if response.status_code == 200:
+            validators.store(key, response)
+
+        return response
+
+    def limited(self, method, url, params=None, data=None, headers=None, timeout=None):
+
+        metrics = getattr(self.local, "metrics", None) or Metrics()
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+
+            if attempt:
+                metrics.retry()
+
+            if self.limiter is not None:
+                try:
+                    metrics.throttle(self.limiter.acquire(headers))
+                except (IOError, OSError):
+                    self.limiter = None
+
+            start_time = time.time()
+            response = self.send(method, url, params, data, headers, timeout)
+            metrics.request(method, url, data, response, time.time() - start_time)
+
+            if self.limiter is not None:
+                try:
+                    self.limiter.update(headers, response)
+                except (IOError, OSError):
+                    self.limiter = None
+
+            if response.status_code != 429:
+                break
+
+            if self.limiter is None:
+                time.sleep(min(2 ** attempt, 60))
+
+        return response
+
+    def send(self, method, url, params=None, data=None, headers=None, timeout=None):
+
+        if self.worker is not None:
+
+            try:
+                return self.worker.request(method, url, params, data, headers, timeout)
+            except WorkerUnavailable:
+                self.worker = None
+
+        return self.session().request(
+            method, url, params=params, data=data, headers=headers, timeout=timeout
+        )
+
+
+def transport():
+    """
+    Puts the Transport in place of requests within doboto, once per process, and returns it
+    """
+
+    if not isinstance(doboto.Endpoint.requests, Transport):
+
+        worker = None
+
+        if WORKER:
+            worker = Worker(WORKER if WORKER.startswith(os.sep) else WORKER_PATH)
+
+        doboto.Endpoint.requests = Transport(
+            worker, RateLimiter() if RATE_LIMIT else None, Validators() if VALIDATE else None
+        )
+
+    return doboto.Endpoint.requests
+
+
+class Poller(object):
+    """
+    Waits with a fast first check, a jump to half the expected duration if known, then
+    exponential backoff with jitter, never sleeping longer than poll seconds at a time
+    """
+
+    def __init__(self, poll=5, timeout=300, expected=None, metrics=None, first=POLL_FIRST):
+        self.first = first
+        self.poll = max(poll, first)
+        self.timeout = timeout
+        self.expected = expected
+        self.metrics = metrics or Metrics()
+
+    def delays(self):
+
+        yield self.first
+
+        delay = self.first
+
+        if self.expected is not None and self.expected / 2.0 > self.first:
+            yield min(self.expected / 2.0 - self.first, self.poll)
+            delay = min(max(delay, self.expected / 10.0), self.poll)
+
+        while True:
+            delay = min(delay * POLL_BACKOFF, self.poll)
+            yield min(delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER), self.poll)
+
+    def wait(self, value, refresh, done):
+        """
+        Replaces value with refresh(value) until done(value), raising on timeout
+        """
+
+        start_time = time.time()
+        delays = self.delays()
+
+        while not done(value):
+
+            elapsed = time.time() - start_time
+
+            if elapsed > self.timeout:
+                raise DOBOTOPollingException(polling=value)
+
+            delay = max(min(next(delays), self.timeout - elapsed), 0.1)
+            time.sleep(delay)
+            self.metrics.poll(delay)
+
+            try:
+                value = refresh(value)
+            except DOBOTONotFoundException:
+                pass
+            except Exception as exception:
+                if time.time() - start_time > self.timeout:
+                    raise DOBOTOPollingException(polling=value, error=exception)
+
+        return value
+
+
+class BatchExit(Exception):
+    """
+    Carries a batch item's exit_json or fail_json result back out of act()
+    """
+
+    def __init__(self, result):
+        super(BatchExit, self).__init__()
+        self.result = result
+
+
+def batch_exit_json(module, **kwargs):
+    raise BatchExit(kwargs)
+
+
+def batch_fail_json(module, msg=None, **kwargs):
+    kwargs["failed"] = True
+    kwargs["msg"] = msg
+    raise BatchExit(kwargs)
+
+
 class DOBOTOModule(object):
 
     url = "https://api.digitalocean.com/v2"
     agent = "DOBOTO Ansible"
 
+    cache_ttls = {
+        "regions": 86400,
+        "sizes": 86400,
+        "kernels": 3600,
+        "images": 600
+    }
+
     def __init__(self):
 
+        if "doboto_batch" in _load_params():
+            self.batch()
+
         self.module = self.input()
+        self.connect()
+        self.run()
+
+    def connect(self):
+
+        self.metrics = Metrics()
+        self.module.exit_json = self.metrics.wrap(self.module.exit_json)
+        self.module.fail_json = self.metrics.wrap(self.module.fail_json)
+        self.module.exit_json = self.project(self.module.exit_json)
+        self.module.exit_json = self.action_ids(self.module.exit_json)
 
         if not HAS_DOBOTO:
             self.module.fail_json(msg="the doboto package is required")
@@ -69,20 +1154,468 @@ class DOBOTOModule(object):
         if token is None:
             self.module.fail_json(msg="the token parameter is required")
 
+        self.token = token
         self.do = DO(token=token, url=self.module.params["url"], agent=self.agent)
 
+        self.transport = transport()
+
+        # Batched items share the transport, so one with its own cache_dir keeps its validators
+        # to the threads running it
+
+        self.validators = None
+
+        if self.transport.validators is not None and self.module.params.get("cache_dir"):
+            self.validators = Validators(self.module.params["cache_dir"])
+
+    def run(self):
+
         try:
-            self.act()
+            with self.transport.measure(self.metrics, self.validators):
+                self.act()
         except DOBOTONotFoundException as exception:
             self.module.fail_json(msg=exception.message)
         except DOBOTOPollingException as exception:
+            result = {}
+            if isinstance(exception.polling, list):
+                result["progress"] = progress(exception.polling)
             self.module.fail_json(
                 msg=exception.message,
                 polling=exception.polling,
-                error=exception.error
+                error=exception.error,
+                **result
             )
         except DOBOTOException as exception:
             self.module.fail_json(msg=exception.message, result=exception.result)
 
     def act(self):
         getattr(self, self.module.params["action"])()
+
+    def project(self, exit_json):
+        """
+        Returns exit_json trimming the results of list and info actions by the fields and query
+        parameters, so only what's wanted is serialized and sent back
+        """
+
+        def wrapper(**kwargs):
+
+            fields = self.module.params.get("fields")
+            query = self.module.params.get("query")
+
+            if (fields is None and query is None) or \
+               not PROJECT_ACTIONS.match(self.module.params.get("action") or "info"):
+                return exit_json(**kwargs)
+
+            if query is not None and not HAS_JMESPATH:
+                self.module.fail_json(msg="the jmespath package is required for query")
+
+            for (name, value) in kwargs.items():
+
+                if name == "changed":
+                    continue
+
+                if fields is not None:
+                    value = pick(value, fields)
+
+                if query is not None:
+                    try:
+                        value = jmespath.search(query, value)
+                    except jmespath.exceptions.JMESPathError as exception:
+                        self.module.fail_json(msg="invalid query: %s" % exception)
+
+                kwargs[name] = value
+
+            return exit_json(**kwargs)
+
+        return wrapper
+
+    def batch(self):
+        """
+        Runs the module once per set of parameters in doboto_batch, as sent by the action plugins
+        when collapsing a loop, and exits with each run's result in order
+        """
+
+        module = AnsibleModule(argument_spec=dict(
+            doboto_batch=dict(required=True, type='list'),
+            doboto_concurrency=dict(default=BATCH_CONCURRENCY, type='int')
+        ))
+
+        internal = {
+            name: value for (name, value) in _load_params().items() if name.startswith("_ansible_")
+        }
+
+        for params in module.params["doboto_batch"]:
+            if params.get("token") is not None:
+                module.no_log_values.add(params["token"])
+
+        load_params = AnsibleModule._load_params
+        exits = (AnsibleModule.exit_json, AnsibleModule.fail_json)
+
+        AnsibleModule.exit_json = batch_exit_json
+        AnsibleModule.fail_json = batch_fail_json
+
+        try:
+
+            items = []
+
+            # Parameters are validated up front as AnsibleModule reads them through a class hook
+
+            for params in module.params["doboto_batch"]:
+
+                AnsibleModule._load_params = lambda item, params=dict(params, **internal): \
+                    setattr(item, "params", params)
+
+                item = copy.copy(self)
+
+                try:
+                    item.module = item.input()
+                    item.connect()
+                    items.append(item)
+                except BatchExit as exit:
+                    items.append(exit.result)
+
+            AnsibleModule._load_params = load_params
+
+            pool = ThreadPool(max(module.params["doboto_concurrency"], 1))
+
+            try:
+                results = pool.map(
+                    lambda item: item if isinstance(item, dict) else item.item(), items
+                )
+            finally:
+                pool.close()
+
+        finally:
+            AnsibleModule._load_params = load_params
+            (AnsibleModule.exit_json, AnsibleModule.fail_json) = exits
+
+        metrics = Metrics()
+
+        for result in results:
+            metrics.add(result.get("doboto_metrics", {}))
+
+        module.exit_json(
+            changed=any(result.get("changed", False) for result in results), results=results,
+            doboto_metrics=metrics.report()
+        )
+
+    def item(self):
+
+        try:
+            self.run()
+        except BatchExit as exit:
+            return exit.result
+
+        return {}
+
+    def action_ids(self, exit_json):
+        """
+        Returns exit_json adding the ids of any actions started, so they can be waited on later
+        """
+
+        def wrapper(**kwargs):
+
+            actions = kwargs.get("actions", kwargs.get("action"))
+
+            if isinstance(actions, dict):
+                actions = [actions]
+
+            if kwargs.get("changed") and isinstance(actions, list) and all(
+                isinstance(action, dict) and "id" in action and "status" in action
+                for action in actions
+            ):
+                kwargs["action_ids"] = [action["id"] for action in actions]
+
+            return exit_json(**kwargs)
+
+        return wrapper
+
+    def map(self, function, items, concurrency=BATCH_CONCURRENCY):
+        """
+        Calls function on each item, up to concurrency at once, counting API calls in metrics
+        """
+
+        items = list(items)
+
+        if len(items) < 2 or concurrency < 2:
+            return [function(item) for item in items]
+
+        def measured(item):
+            with self.transport.measure(self.metrics, self.validators):
+                return function(item)
+
+        pool = ThreadPool(min(concurrency, len(items)))
+
+        try:
+            return pool.map(measured, items)
+        finally:
+            pool.close()
+
+    def chunks(self, send, items, size=CHUNK_SIZE, concurrency=BATCH_CONCURRENCY):
+        """
+        Calls send with the items a chunk at a time, concurrently, then sends any chunks that
+        failed again, backing off between rounds, until they succeed or run out of attempts,
+        returning a report of each chunk and the items that never made it
+        """
+
+        size = max(size, 1)
+
+        chunks = [
+            {"index": index, "items": items[start:start + size], "attempts": 0, "error": None}
+            for (index, start) in enumerate(range(0, len(items), size))
+        ]
+
+        def attempt(chunk):
+            chunk["attempts"] += 1
+            try:
+                send(chunk["items"])
+                chunk["error"] = None
+            except DOBOTOException as exception:
+                chunk["error"] = failure(exception)
+            except (requests.exceptions.RequestException, ValueError) as exception:
+                chunk["error"] = str(exception)
+
+        pending = chunks
+        delays = Poller(metrics=self.metrics).delays()
+
+        for number in range(CHUNK_ATTEMPTS):
+
+            if number:
+                delay = next(delays)
+                time.sleep(delay)
+                self.metrics.poll(delay)
+
+            self.map(attempt, pending, concurrency)
+
+            pending = [chunk for chunk in chunks if chunk["error"] is not None]
+
+            if not pending:
+                break
+
+        report = [
+            {
+                "index": chunk["index"],
+                "resources": len(chunk["items"]),
+                "attempts": chunk["attempts"],
+                "error": chunk["error"]
+            }
+            for chunk in chunks
+        ]
+
+        return (report, [item for chunk in pending for item in chunk["items"]])
+
+    def cached(self, resource, fetch, *args, **kwargs):
+        """
+        Calls fetch, going through the on disk cache according to the cache parameter
+        """
+
+        mode = self.module.params.get("cache")
+
+        if mode is None or mode == "bypass":
+            return fetch(*args, **kwargs)
+
+        ttl = self.module.params.get("cache_ttl")
+
+        if ttl is None:
+            ttl = self.cache_ttls.get(resource, CACHE_TTL)
+
+        cache = Cache(
+            self.module.params.get("cache_dir") or CACHE_DIR,
+            self.module.params.get("cache_size") or CACHE_SIZE
+        )
+
+        key = self.cache_key(self.module.params["action"], resource, args, kwargs)
+
+        if mode == "use":
+            (found, value) = cache.get(key, ttl)
+            if found:
+                return value
+
+        with cache.lock(key):
+
+            # Another process may have filled the entry while we were waiting
+
+            if mode == "use":
+                (found, value) = cache.get(key, ttl)
+                if found:
+                    return value
+
+            value = fetch(*args, **kwargs)
+            cache.set(key, value)
+
+        return value
+
+    def cache_key(self, action, resource, args, kwargs):
+
+        return Cache.key(
+            hashlib.sha256(self.token.encode('utf-8')).hexdigest(),
+            self.module.params["url"], action, resource, args, kwargs,
+            [self.module.params.get(name) for name in PAGING]
+        )
+
+    def uncache(self, action, resource, *args, **kwargs):
+        """
+        Drops what cached stored for resource when called by action, now that it's out of date
+        """
+
+        Cache(self.module.params.get("cache_dir") or CACHE_DIR).delete(
+            self.cache_key(action, resource, args, kwargs)
+        )
+
+    def pages(self, endpoint, expect, params=None, page=None, per_page=PAGE_SIZE, uri=None):
+        """
+        Yields items from one of the DO endpoints (or uri under it) a page at a time, only
+        fetching the next page when the last one's been used up, or just the one page if given
+        """
+
+        url = uri or endpoint.uri
+        headers = endpoint.headers()
+
+        params = {name: value for (name, value) in (params or {}).items() if value is not None}
+        params["per_page"] = per_page
+
+        if page is not None:
+            params["page"] = page
+
+        while url:
+
+            result = self.transport.get(url, params=params, headers=headers, timeout=60).json()
+
+            if expect not in result:
+                raise DOBOTOException(result=result)
+
+            for item in result[expect]:
+                yield item
+
+            if page is not None:
+                break
+
+            url = result.get("links", {}).get("pages", {}).get("next")
+            params = None
+
+    def paginate(self, endpoint, expect, params=None):
+        """
+        Lists from one of the DO endpoints, stopping at the limit parameter or the first item
+        the stop parameter's true for without fetching any more pages
+        """
+
+        limit = self.module.params.get("limit")
+        stop = self.module.params.get("stop")
+
+        per_page = self.module.params.get("per_page") or min(max(limit or PAGE_SIZE, 1), PAGE_SIZE)
+
+        if stop is not None:
+
+            if not HAS_JMESPATH:
+                self.module.fail_json(msg="the jmespath package is required for stop")
+
+            try:
+                stop = jmespath.compile(stop)
+            except jmespath.exceptions.JMESPathError as exception:
+                self.module.fail_json(msg="invalid stop: %s" % exception)
+
+        items = []
+
+        if limit is not None and limit < 1:
+            return items
+
+        for item in self.pages(endpoint, expect, params, self.module.params.get("page"), per_page):
+
+            if stop is not None and stop.search(item):
+                break
+
+            items.append(item)
+
+            if limit is not None and len(items) >= limit:
+                break
+
+        return items
+
+    def wait(self, value, refresh, done, expected=None):
+        """
+        Polls value until done if the wait parameter is set
+        """
+
+        if not self.module.params["wait"]:
+            return value
+
+        return Poller(
+            self.module.params["poll"], self.module.params["timeout"], POLL_HINTS.get(expected),
+            self.metrics
+        ).wait(value, refresh, done)
+
+    def wait_action(self, action):
+        return self.wait(
+            action,
+            lambda action: self.do.action.info(action["id"]),
+            lambda action: action["status"] != "in-progress",
+            action["type"]
+        )
+
+    def wait_actions(self, actions, listing=False):
+        """
+        Waits on all actions at once, always refreshing them from the listing if asked, as with
+        the actions of everything with a tag
+        """
+
+        if not actions:
+            return actions
+
+        return self.wait(
+            actions,
+            lambda actions: self.refresh_actions(actions, listing),
+            lambda actions: all(action["status"] != "in-progress" for action in actions),
+            actions[0]["type"]
+        )
+
+    def recent_actions(self, wanted):
+        """
+        Returns those of the wanted action ids found in the most recent pages of actions
+        """
+
+        found = {}
+        lowest = min(wanted)
+        previous = None
+
+        for (index, action) in enumerate(self.pages(self.do.action, "actions")):
+
+            if action["id"] in wanted:
+                found[action["id"]] = action
+
+            if len(found) == len(wanted) or index + 1 >= WAIT_PAGES * PAGE_SIZE:
+                break
+
+            # Newest first and already past the oldest we want
+
+            if previous is not None and previous > action["id"] and action["id"] < lowest:
+                break
+
+            previous = action["id"]
+
+        return found
+
+    def refresh_actions(self, actions, listing=False):
+        """
+        Refreshes the in-progress actions, through recent pages of actions when listing or there's
+        enough of them, then concurrently one by one for any still missing
+        """
+
+        pending = set(action["id"] for action in actions if action["status"] == "in-progress")
+
+        found = {}
+
+        if pending and (listing or len(pending) > WAIT_LIST):
+            found = self.recent_actions(pending)
+
+        def info(action_id):
+            try:
+                return self.do.action.info(action_id)
+            except DOBOTONotFoundException:
+                return None
+
+        missing = [action_id for action_id in pending if action_id not in found]
+
+        for action in self.map(info, missing):
+            if action is not None:
+                found[action["id"]] = action
+
+        return [found.get(action["id"], action) for action in actions]
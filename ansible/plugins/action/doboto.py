@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+
+from ansible.plugins.action import ActionBase
+from ansible.parsing.mod_args import ModuleArgsParser
+
+"""
+Ansible action plugin for DigitalOcean DOBOTO modules
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+BATCH_CONCURRENCY = 4
+
+# Each task and host runs its loop in one worker process, so results computed on the first item
+# are kept here and handed out as Ansible asks for the rest
+
+BATCHES = {}
+
+
+class ActionModule(ActionBase):
+    """
+    Collapses a loop over a DOBOTO module into one module execution, running every item's
+    parameters with bounded concurrency on the first item and returning the stored results
+    for the rest. Set doboto_batch to false to run each item on its own.
+    """
+
+    def run(self, tmp=None, task_vars=None):
+
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        batched = self.batched(task_vars)
+
+        if batched is None:
+            result.update(self._execute_module(task_vars=task_vars))
+        else:
+            result.update(batched)
+
+        return result
+
+    def batched(self, task_vars):
+        """
+        Returns this item's result from the batch, or None if it should run on its own
+        """
+
+        loop_control = self._task.loop_control
+
+        if not task_vars.get("doboto_batch", True) or self._task.when or \
+           (not self._task.loop and not getattr(self._task, "loop_with", None)):
+            return None
+
+        # Retried items and ones that need their place in the loop have to run as they come
+
+        if self._task.until or self._task.retries is not None or (loop_control and (
+           loop_control.index_var or getattr(loop_control, "extended", False))):
+            return None
+
+        batch = (self._task._uuid, task_vars.get("inventory_hostname"))
+
+        if batch not in BATCHES:
+
+            # Batches of tasks that already finished are of no more use
+
+            for finished in [key for key in BATCHES if key[0] != batch[0]]:
+                del BATCHES[finished]
+
+            state = BATCHES[batch] = {
+                "ran": False, "results": {}, "error": None, "left": 0, "count": 0
+            }
+
+            try:
+                self.collect(state, task_vars)
+            except Exception as exception:
+                if not state["ran"]:
+                    self._display.vvv("doboto: not batching %s: %s" % (self._task.action, exception))
+                else:
+                    state["error"] = "doboto: batch failed after running: %s" % exception
+
+        state = BATCHES[batch]
+
+        if not state["ran"]:
+            return None
+
+        if state["error"] is not None:
+            return {"failed": True, "msg": state["error"]}
+
+        # Each item takes the result of the batch item with the same arguments
+
+        results = state["results"].get(self.key(self.arguments(task_vars)))
+
+        if not results:
+            if not state["left"]:
+                error = "doboto: batch ran %s items, not %s" % (state["count"], state["count"] + 1)
+            else:
+                error = "doboto: batch of %s items ran none with these arguments" % state["count"]
+            return {"failed": True, "msg": error}
+
+        result = results.pop(0)
+        state["left"] -= 1
+
+        # Only a marker that the batch ran is kept once the loop's done, so nothing runs twice
+
+        if not state["left"]:
+            BATCHES[batch] = {
+                "ran": True, "results": {}, "error": None, "left": 0, "count": state["count"]
+            }
+
+        return result
+
+    def loop_var(self):
+
+        if self._task.loop_control and self._task.loop_control.loop_var:
+            return self._task.loop_control.loop_var
+
+        return "item"
+
+    def items(self, task_vars):
+        """
+        Returns every item of the loop, checking the first is the one Ansible's running now
+        """
+
+        if getattr(self._task, "loop_with", None):
+            (lookup, terms) = (self._task.loop_with, self._task.loop)
+        elif getattr(self._task, "loop_args", None) is not None:
+            (lookup, terms) = (self._task.loop, self._task.loop_args)
+        else:
+            (lookup, terms) = (None, self._task.loop)
+
+        terms = self._templar.template(terms)
+
+        if lookup is None:
+            items = terms
+        else:
+            if not isinstance(terms, list):
+                terms = [terms]
+            items = self._shared_loader_obj.lookup_loader.get(
+                lookup, loader=self._loader, templar=self._templar
+            ).run(terms=terms, variables=task_vars, wantlist=True)
+
+        item = task_vars.get(self.loop_var())
+
+        # Newer Ansible hands actions a loop: template wrapped in a list, templating to one item
+        # holding all of them
+
+        if lookup is None and isinstance(items, list) and len(items) == 1 and \
+           isinstance(items[0], list) and items[0][:1] == [item] and items[:1] != [item]:
+            items = items[0]
+
+        if not isinstance(items, list) or items[:1] != [item]:
+            raise ValueError("loop items don't start with %r" % (item,))
+
+        return items
+
+    def arguments(self, variables):
+        """
+        Templates the task's raw arguments with variables, giving an item's own arguments
+        """
+
+        raw = ModuleArgsParser(self._task._ds).parse()[1]
+        available = self._templar.available_variables
+
+        self._templar.available_variables = variables
+
+        try:
+            return self._templar.template(raw)
+        finally:
+            self._templar.available_variables = available
+
+    @staticmethod
+    def key(arguments):
+        return json.dumps(arguments, sort_keys=True, default=str)
+
+    def collect(self, state, task_vars):
+        """
+        Templates the raw arguments for every loop item, over the task's own for anything not
+        given like module_defaults, and runs them all in one execution, keeping the results in
+        state by each item's arguments
+        """
+
+        loop_var = self.loop_var()
+
+        (batch, keys) = ([], [])
+
+        for item in self.items(task_vars):
+            variables = dict(task_vars)
+            variables[loop_var] = item
+            arguments = self.arguments(variables)
+            batch.append(dict(self._task.args, **arguments))
+            keys.append(self.key(arguments))
+
+        state["ran"] = True
+
+        results = self._execute_module(
+            module_name=self._task.action,
+            module_args={
+                "doboto_batch": batch,
+                "doboto_concurrency": task_vars.get("doboto_concurrency", BATCH_CONCURRENCY)
+            },
+            task_vars=task_vars
+        )
+
+        if not isinstance(results.get("results"), list) or len(results["results"]) != len(batch):
+            state["error"] = "doboto: batch of %s items failed: %s" % (
+                len(batch), results.get("msg") or results.get("results")
+            )
+            return
+
+        for (key, result) in zip(keys, results["results"]):
+            state["results"].setdefault(key, []).append(result)
+
+        state["left"] = state["count"] = len(batch)
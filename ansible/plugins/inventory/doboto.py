@@ -0,0 +1,286 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from multiprocessing.pool import ThreadPool
+from ansible.errors import AnsibleError
+from ansible.inventory.group import to_safe_group_name
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
+from ansible.module_utils.doboto_module import (
+    HAS_DOBOTO, DOBOTOModule, PAGE_SIZE, transport
+)
+
+try:
+    from doboto.DO import DO
+except ImportError:
+    pass
+
+"""
+Ansible inventory plugin for DigitalOcean droplets through DOBOTO
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+DOCUMENTATION = '''
+---
+name: doboto
+plugin_type: inventory
+short_description: DigitalOcean droplets through DOBOTO
+description:
+    - Builds hosts from DigitalOcean droplets, grouped by tag, region, size and image
+    - Uses the Ansible inventory cache, and on a refresh requests every page of droplets again by page number, concurrently
+    - With DOBOTO_VALIDATE=1 those are conditional requests, so a page that's the same as last time isn't downloaded again, but creating or deleting a droplet shifts every page after it, which are then downloaded in full
+version_added: "0.6"
+author: "SWE Data <swe-data@do.co>"
+extends_documentation_fragment:
+    - inventory_cache
+    - constructed
+options:
+    plugin:
+        description: marks the file as a config for this plugin
+        required: true
+        choices:
+            - doboto
+    token:
+        description: token to use to connect to the API
+        env:
+            - name: DO_API_TOKEN
+    url:
+        description: URL to use if not official (for experimenting)
+        default: https://api.digitalocean.com/v2
+    tag_name:
+        description: only include droplets with this tag
+    hostnames:
+        description: droplet field to name hosts by
+        default: name
+        choices:
+            - name
+            - id
+            - public_ip
+            - private_ip
+    group_by:
+        description: droplet fields to group hosts by, as tag_*, region_*, size_* and image_* groups
+        type: list
+        default:
+            - tags
+            - region
+            - size
+            - image
+    per_page:
+        description: droplets to fetch per page
+        type: int
+        default: 200
+    concurrency:
+        description: pages to fetch at once
+        type: int
+        default: 4
+'''
+
+EXAMPLES = '''
+# doboto.yml
+plugin: doboto
+cache: true
+cache_plugin: jsonfile
+cache_connection: ~/.doboto/inventory
+cache_timeout: 300
+
+# doboto.yml, only web droplets by IP
+plugin: doboto
+tag_name: web
+hostnames: public_ip
+group_by:
+    - region
+keyed_groups:
+    - key: doboto_status
+      prefix: status
+'''
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = 'doboto'
+
+    def verify_file(self, path):
+
+        return super(InventoryModule, self).verify_file(path) and \
+            path.endswith(("doboto.yml", "doboto.yaml"))
+
+    def parse(self, inventory, loader, path, cache=True):
+
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option('cache') and cache
+        update_cache = self.get_option('cache') and not cache
+
+        droplets = None
+
+        if use_cache:
+            try:
+                droplets = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+
+        if droplets is None:
+            droplets = self.droplets()
+
+        if update_cache:
+            self._cache[cache_key] = droplets
+
+        self.populate(droplets)
+
+    def connect(self):
+
+        if not HAS_DOBOTO:
+            raise AnsibleError("the doboto package is required")
+
+        token = self.get_option('token')
+
+        if not token:
+            raise AnsibleError("the token option or DO_API_TOKEN is required")
+
+        self.do = DO(token=token, url=self.get_option('url'), agent=DOBOTOModule.agent)
+        self.transport = transport()
+
+    def page(self, number):
+        """
+        Fetches a page of droplets by number, which the transport turns into a conditional
+        request when validating, so it's only downloaded again if its droplets are different
+        """
+
+        params = {"page": number, "per_page": self.get_option('per_page') or PAGE_SIZE}
+
+        if self.get_option('tag_name'):
+            params["tag_name"] = self.get_option('tag_name')
+
+        result = self.transport.get(
+            self.do.droplet.uri, params=params, headers=self.do.droplet.headers(), timeout=60
+        ).json()
+
+        if "droplets" not in result:
+            raise AnsibleError("unable to list droplets: %s" % result)
+
+        return {
+            "droplets": result["droplets"],
+            "total": result.get("meta", {}).get("total", len(result["droplets"]))
+        }
+
+    def droplets(self):
+        """
+        Gets the first page to learn how many there are, then the rest concurrently
+        """
+
+        self.connect()
+
+        first = self.page(1)
+
+        per_page = self.get_option('per_page') or PAGE_SIZE
+        count = (first["total"] + per_page - 1) // per_page
+
+        droplets = list(first["droplets"])
+
+        if count > 1:
+
+            pool = ThreadPool(max(self.get_option('concurrency'), 1))
+
+            try:
+                for page in pool.map(self.page, range(2, count + 1)):
+                    droplets.extend(page["droplets"])
+            finally:
+                pool.close()
+
+        # Droplets created while paging can shift others onto pages already fetched
+
+        seen = set()
+
+        return [
+            droplet for droplet in droplets
+            if droplet["id"] not in seen and not seen.add(droplet["id"])
+        ]
+
+    @staticmethod
+    def address(droplet, kind):
+
+        for network in droplet.get("networks", {}).get("v4", []):
+            if network.get("type") == kind:
+                return network["ip_address"]
+
+        return None
+
+    def hostname(self, droplet):
+
+        hostnames = self.get_option('hostnames')
+
+        if hostnames == "id":
+            return str(droplet["id"])
+
+        if hostnames in ["public_ip", "private_ip"]:
+            return self.address(droplet, hostnames.split("_")[0])
+
+        return droplet["name"]
+
+    def populate(self, droplets):
+
+        group_by = self.get_option('group_by') or []
+        strict = self.get_option('strict')
+
+        for droplet in droplets:
+
+            host = self.hostname(droplet)
+
+            if host is None:
+                continue
+
+            self.inventory.add_host(host)
+
+            variables = {
+                "doboto_id": droplet["id"],
+                "doboto_name": droplet["name"],
+                "doboto_status": droplet.get("status"),
+                "doboto_region": droplet.get("region", {}).get("slug"),
+                "doboto_size": droplet.get("size_slug"),
+                "doboto_image": droplet.get("image", {}).get("slug") or
+                                droplet.get("image", {}).get("name"),
+                "doboto_tags": droplet.get("tags", []),
+                "doboto_public_ip": self.address(droplet, "public"),
+                "doboto_private_ip": self.address(droplet, "private"),
+                "doboto_droplet": droplet
+            }
+
+            if variables["doboto_public_ip"]:
+                variables["ansible_host"] = variables["doboto_public_ip"]
+
+            for (name, value) in variables.items():
+                self.inventory.set_variable(host, name, value)
+
+            groups = []
+
+            if "tags" in group_by:
+                groups.extend("tag_%s" % tag for tag in variables["doboto_tags"])
+
+            for field in ["region", "size", "image"]:
+                if field in group_by and variables["doboto_%s" % field]:
+                    groups.append("%s_%s" % (field, variables["doboto_%s" % field]))
+
+            for group in groups:
+                group = to_safe_group_name(group)
+                self.inventory.add_group(group)
+                self.inventory.add_child(group, host)
+
+            self._set_composite_vars(self.get_option('compose'), variables, host, strict=strict)
+            self._add_host_to_composed_groups(self.get_option('groups'), variables, host, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option('keyed_groups'), variables, host, strict=strict)
@@ -0,0 +1,180 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import copy
+import json
+import threading
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible.module_utils.doboto_module import (
+    HAS_DOBOTO, HAS_JMESPATH, DOBOTOModule, PROJECT_ACTIONS, pick, transport
+)
+
+try:
+    from doboto.DO import DO
+    from doboto.exception import DOBOTOException, DOBOTONotFoundException
+except ImportError:
+    pass
+
+try:
+    import jmespath
+except ImportError:
+    pass
+
+"""
+Ansible lookup plugin for read only DigitalOcean queries through DOBOTO
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+DOCUMENTATION = '''
+---
+name: doboto
+plugin_type: lookup
+short_description: read only DigitalOcean queries through DOBOTO
+description:
+    - Runs a list or info call of a DOBOTO resource on the controller, without a module task
+    - Results are kept in memory by the process templating them, so the same lookup only calls the API once there, and later tasks (run in their own processes) call it again, only with conditional requests if DOBOTO_VALIDATE=1
+version_added: "0.6"
+author: "SWE Data <swe-data@do.co>"
+options:
+    _terms:
+        description: resource (droplet, image, region, ...) then action (list, info, record_list, ...)
+        required: true
+    token:
+        description: token to use to connect to the API (uses DO_API_TOKEN from ENV if not found)
+    url:
+        description: URL to use if not official (for experimenting)
+        default: https://api.digitalocean.com/v2
+    fields:
+        description: only return these fields of each result, with dots for nested fields (like networks.v4)
+        type: list
+    query:
+        description: JMESPath expression applied to the result (after fields)
+    refresh:
+        description: ignore what's been kept in memory and call the API again
+        type: bool
+        default: false
+notes:
+    - Any other keyword is passed to the DOBOTO call, like id, name or tag_name
+    - Only list and info actions are allowed
+'''
+
+EXAMPLES = '''
+- name: lookup | image id
+  debug:
+    msg: "{{ lookup('doboto', 'image', 'info', id_slug='ubuntu-16-04-x64', query='id') }}"
+
+- name: lookup | droplet public ip
+  debug:
+    msg: "{{ lookup('doboto', 'droplet', 'info', id=1234, query=public_ipv4_query) }}"
+  vars:
+    public_ipv4_query: "networks.v4[?type=='public'].ip_address | [0]"
+
+- name: lookup | droplets with tag
+  debug:
+    msg: "{{ item }}"
+  with_items: "{{ query('doboto', 'droplet', 'list', tag_name='web', fields=['id', 'name']) }}"
+'''
+
+RETURN = '''
+_raw:
+    description: the list call's results, or the info call's result, after fields and query
+'''
+
+# Results by call, for as long as this process is templating
+
+MEMO = {}
+MEMO_LOCK = threading.Lock()
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+
+        if not HAS_DOBOTO:
+            raise AnsibleError("the doboto package is required")
+
+        if len(terms) not in [1, 2]:
+            raise AnsibleError("doboto lookup takes a resource and an action")
+
+        resource = terms[0]
+        action = terms[1] if len(terms) > 1 else "list"
+
+        if not PROJECT_ACTIONS.match(action):
+            raise AnsibleError("doboto lookup only allows list and info actions, not %s" % action)
+
+        token = kwargs.pop("token", None) or os.environ.get('DO_API_TOKEN', None)
+        url = kwargs.pop("url", None) or DOBOTOModule.url
+        fields = kwargs.pop("fields", None)
+        query = kwargs.pop("query", None)
+        refresh = kwargs.pop("refresh", False)
+
+        if token is None:
+            raise AnsibleError("the token option or DO_API_TOKEN is required")
+
+        if query is not None and not HAS_JMESPATH:
+            raise AnsibleError("the jmespath package is required for query")
+
+        value = self.call(token, url, resource, action, kwargs, refresh)
+
+        if fields is not None:
+            value = pick(value, fields)
+
+        if query is not None:
+            try:
+                value = jmespath.search(query, value)
+            except jmespath.exceptions.JMESPathError as exception:
+                raise AnsibleError("invalid query: %s" % exception)
+
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def call(token, url, resource, action, params, refresh=False):
+        """
+        Calls the DOBOTO endpoint, or returns a copy of what it returned last time for the same
+        arguments, so templating that changes the result can't change what later lookups get
+        """
+
+        key = json.dumps([token, url, resource, action, params], sort_keys=True, default=str)
+
+        with MEMO_LOCK:
+            if not refresh and key in MEMO:
+                return copy.deepcopy(MEMO[key])
+
+        transport()
+
+        do = DO(token=token, url=url, agent=DOBOTOModule.agent)
+
+        endpoint = getattr(do, resource, None)
+
+        if endpoint is None or not hasattr(endpoint, action):
+            raise AnsibleError("doboto has no %s %s" % (resource, action))
+
+        try:
+            value = getattr(endpoint, action)(**params)
+        except DOBOTONotFoundException:
+            raise AnsibleError("doboto %s %s %s not found" % (resource, action, params))
+        except DOBOTOException as exception:
+            raise AnsibleError("doboto %s %s failed: %s" % (resource, action, exception.result))
+        except TypeError as exception:
+            raise AnsibleError("doboto %s %s: %s" % (resource, action, exception))
+
+        with MEMO_LOCK:
+            MEMO[key] = copy.deepcopy(value)
+
+        return value
@@ -40,6 +40,10 @@ options:
             - info
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -58,6 +62,8 @@ class Account(DOBOTOModule):
             token=dict(default=None, no_log=True),
             action=dict(default=None),
             url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
         ))
 
     def info(self):
@@ -43,6 +43,18 @@ options:
         description: (Action ID) same as DO API variable
     url:
         description: URL to use if not official (for experimenting)
+    limit:
+        description: most results to return from list, only fetching the pages needed
+    page:
+        description: only return this page of results from list
+    per_page:
+        description: results per page when listing (default 200, or limit if lower)
+    stop:
+        description: JMESPath expression, list stops before the first result it's true for (requires jmespath)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -51,6 +63,18 @@ EXAMPLES = '''
     action: list
   register: action_list
 
+- name: action | list | limit
+  doboto_action:
+    action: list
+    limit: 50
+  register: action_list_limit
+
+- name: action | list | stop
+  doboto_action:
+    action: list
+    stop: "started_at < '2017-01-01'"
+  register: action_list_stop
+
 - name: action | info
   doboto_action:
     action: info
@@ -69,10 +93,16 @@ class Action(DOBOTOModule):
             token=dict(default=None, no_log=True),
             id=dict(default=None),
             url=dict(default=self.url),
+            limit=dict(default=None, type='int'),
+            page=dict(default=None, type='int'),
+            per_page=dict(default=None, type='int'),
+            stop=dict(default=None),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, actions=self.do.action.list())
+        self.module.exit_json(changed=False, actions=self.paginate(self.do.action, "actions"))
 
     @require("id")
     def info(self):
@@ -55,6 +55,10 @@ options:
         description: same as DO API variable
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -123,6 +127,8 @@ class Certificate(DOBOTOModule):
             leaf_certificate=dict(default=None),
             certificate_chain=dict(default=None),
             url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
         ))
 
     def list(self):
@@ -1,8 +1,17 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
+import hashlib
+import binascii
+import threading
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, DOBOTOModule, BATCH_CONCURRENCY, failure
+
+try:
+    from doboto.exception import DOBOTOException
+except ImportError:
+    pass
 
 """
 Ansible module to manage DigitalOcean domains
@@ -47,6 +56,10 @@ options:
             - record_info
             - record_update
             - record_destroy
+            - records_sync
+            - record_find
+            - zone_import
+            - zone_export
     name:
         description: same as DO API variable
     ip_address:
@@ -65,8 +78,32 @@ options:
         description: same as DO API variable port for records
     record_weight:
         description: same as DO API variable weight for records
+    records:
+        description: records records_sync should leave, each with type, name (default @), data and optionally priority, port, weight, ttl, flags and tag
+    prune:
+        description: have records_sync and zone_import also destroy records not in records or the zone file (except SOA)
+    path:
+        description: zone file zone_import reads or zone_export writes
+    concurrency:
+        description: most API calls to make at once when changing many records (default 4)
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
+    cache:
+        description: use, refresh or bypass (default) the on disk cache of the records record_find searches
+        choices:
+            - use
+            - refresh
+            - bypass
+    cache_dir:
+        description: directory for the result cache (uses DOBOTO_CACHE_DIR from ENV or ~/.doboto/cache)
+    cache_ttl:
+        description: seconds a cached result stays fresh (default 300)
+    cache_size:
+        description: maximum bytes of the result cache before least recently used results are evicted
 '''
 
 EXAMPLES = '''
@@ -133,6 +170,43 @@ EXAMPLES = '''
     record_id: "{{ domain_record_create.domain_record.id }}"
   register: domain_record_destroy
 
+- name: domain | record | find
+  doboto_domain:
+    action: record_find
+    name: domain.create.com
+    record_type: A
+    record_name: www
+    cache: use
+  register: domain_record_find
+
+- name: domain | zone | import
+  doboto_domain:
+    action: zone_import
+    name: domain.create.com
+    path: /etc/bind/db.domain.create.com
+    concurrency: 8
+
+- name: domain | zone | export
+  doboto_domain:
+    action: zone_export
+    name: domain.create.com
+    path: /tmp/db.domain.create.com
+
+- name: domain | records | sync
+  doboto_domain:
+    action: records_sync
+    name: domain.create.com
+    records:
+      - type: A
+        name: www
+        data: 1.2.3.4
+      - type: MX
+        name: "@"
+        data: mail.domain.create.com.
+        priority: 10
+    prune: true
+  register: domain_records_sync
+
 - name: domain | destroy
   doboto_domain:
     action: destroy
@@ -141,6 +215,160 @@ EXAMPLES = '''
 
 '''
 
+RECORD_FIELDS = ["type", "name", "data", "priority", "port", "weight", "ttl", "flags", "tag"]
+
+# Types whose data is a hostname, and types with only one record per name
+
+RECORD_HOSTNAMES = ["CNAME", "MX", "NS", "SRV"]
+RECORD_SINGLES = ["CNAME"]
+
+# Zones indexed this run, shared by the items of a collapsed loop
+
+ZONES = {}
+ZONES_LOCK = threading.Lock()
+
+# Zone file TTL units, classes and the most characters in one TXT string
+
+ZONE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+ZONE_CLASSES = ["IN", "CS", "CH", "HS"]
+ZONE_TXT = 255
+
+
+def zone_tokens(line):
+    """
+    Splits a zone file line into (token, quoted) up to any comment, with parentheses as tokens
+    """
+
+    tokens = []
+    (token, quoted, escaped, quoting) = (None, False, False, False)
+
+    for char in line:
+
+        if quoting:
+            if escaped:
+                token += char
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                quoting = False
+            else:
+                token += char
+            continue
+
+        if char == '"':
+            if token is not None:
+                tokens.append((token, quoted))
+            (token, quoted, quoting) = ("", True, True)
+        elif char == ";":
+            break
+        elif char.isspace() or char in "()":
+            if token is not None:
+                tokens.append((token, quoted))
+            token = None
+            if char in "()":
+                tokens.append((char, False))
+        else:
+            if token is None or quoted:
+                if token is not None:
+                    tokens.append((token, quoted))
+                (token, quoted) = ("", False)
+            token += char
+
+    if token is not None:
+        tokens.append((token, quoted))
+
+    return tokens
+
+
+def zone_entries(lines):
+    """
+    Yields the tokens of each entry in a zone file, joining lines inside parentheses, and
+    whether it started with whitespace (so is for the previous owner)
+    """
+
+    (tokens, inherit, depth) = ([], False, 0)
+
+    for line in lines:
+
+        if depth == 0:
+            inherit = line[:1] in [" ", "\t"]
+
+        for (token, quoted) in zone_tokens(line):
+            if not quoted and token == "(":
+                depth += 1
+            elif not quoted and token == ")":
+                depth -= 1
+            else:
+                tokens.append((token, quoted))
+
+        if depth == 0 and tokens:
+            yield (inherit, tokens)
+            tokens = []
+
+    if tokens:
+        yield (inherit, tokens)
+
+
+def zone_seconds(value):
+    """
+    Converts a zone file TTL like 3600 or 1h30m to seconds, None if it isn't one
+    """
+
+    (seconds, number) = (0, "")
+
+    for char in value.lower():
+        if char.isdigit():
+            number += char
+        elif char in ZONE_UNITS and number:
+            seconds += int(number) * ZONE_UNITS[char]
+            number = ""
+        else:
+            return None
+
+    if number:
+        seconds += int(number)
+
+    return seconds if value else None
+
+
+def zone_absolute(name, origin):
+
+    if name == "@":
+        return origin
+
+    if name.endswith("."):
+        return name
+
+    return "%s.%s" % (name, origin)
+
+
+def zone_txt(tokens):
+    """
+    Returns TXT data from its tokens, quoted strings running together as they're a single value
+    split up, and anything else separated by spaces
+    """
+
+    data = ""
+
+    for (index, (token, quoted)) in enumerate(tokens):
+        if index and not (quoted and tokens[index - 1][1]):
+            data += " "
+        data += token
+
+    return data
+
+
+def zone_text(value):
+    """
+    Quotes TXT data for a zone file, in as many strings as it takes
+    """
+
+    return " ".join(
+        '"%s"' % value[start:start + ZONE_TXT].replace("\\", "\\\\").replace('"', '\\"')
+        for start in range(0, max(len(value), 1), ZONE_TXT)
+    )
+
 
 class Domain(DOBOTOModule):
 
@@ -156,7 +384,11 @@ class Domain(DOBOTOModule):
                 "record_create",
                 "record_info",
                 "record_update",
-                "record_destroy"
+                "record_destroy",
+                "records_sync",
+                "record_find",
+                "zone_import",
+                "zone_export"
             ]),
             token=dict(default=None, no_log=True),
             name=dict(default=None),
@@ -168,7 +400,17 @@ class Domain(DOBOTOModule):
             record_priority=dict(default=None),
             record_port=dict(default=None),
             record_weight=dict(default=None),
-            url=dict(default=self.url)
+            records=dict(default=None, type='list'),
+            prune=dict(default=False, type='bool'),
+            path=dict(default=None),
+            concurrency=dict(default=BATCH_CONCURRENCY, type='int'),
+            url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            cache=dict(default="bypass", choices=["use", "refresh", "bypass"]),
+            cache_dir=dict(default=None),
+            cache_ttl=dict(default=None, type='int'),
+            cache_size=dict(default=None, type='int'),
         ))
 
     def list(self):
@@ -223,9 +465,10 @@ class Domain(DOBOTOModule):
             if self.module.params["record_%s" % field] is not None:
                 attribs[field] = self.module.params["record_%s" % field]
 
-        self.module.exit_json(changed=True, domain_record=self.do.domain.record_create(
-            self.module.params["name"], attribs
-        ))
+        record = self.do.domain.record_create(self.module.params["name"], attribs)
+        self.forget()
+
+        self.module.exit_json(changed=True, domain_record=record)
 
     @require("name")
     @require("record_id")
@@ -251,17 +494,489 @@ class Domain(DOBOTOModule):
             if self.module.params["record_%s" % field] is not None:
                 attribs[field] = self.module.params["record_%s" % field]
 
-        self.module.exit_json(changed=True, domain_record=self.do.domain.record_update(
+        record = self.do.domain.record_update(
             self.module.params["name"], self.module.params["record_id"], attribs
-        ))
+        )
+        self.forget()
+
+        self.module.exit_json(changed=True, domain_record=record)
 
     @require("name")
     @require("record_id")
     def record_destroy(self):
-        self.module.exit_json(changed=True, result=self.do.domain.record_destroy(
+
+        result = self.do.domain.record_destroy(
             self.module.params["name"], self.module.params["record_id"]
+        )
+        self.forget()
+
+        self.module.exit_json(changed=True, result=result)
+
+    def relative(self, name):
+        """
+        Returns name relative to the domain, with @ for the domain itself
+        """
+
+        domain = self.module.params["name"].lower()
+        name = str(name or "@").lower().rstrip(".")
+
+        if name in ["", "@", domain]:
+            return "@"
+
+        if name.endswith("." + domain):
+            return name[:-len(domain) - 1]
+
+        return name
+
+    def key(self, record):
+        """
+        Returns what identifies a record, (type, name, data), the same however it's written
+        """
+
+        type = str(record["type"]).upper()
+        data = str(record.get("data"))
+
+        if type in RECORD_HOSTNAMES:
+            data = self.relative(data)
+
+        return (type, self.relative(record.get("name")), data)
+
+    def desired(self, records):
+        """
+        Returns records as attribs, without duplicates
+        """
+
+        desired = []
+        keys = set()
+
+        for record in records:
+
+            if not isinstance(record, dict) or not record.get("type") or "data" not in record:
+                self.module.fail_json(msg="each of records needs a type and data: %s" % record)
+
+            attribs = dict(
+                (field, record[field]) for field in RECORD_FIELDS if record.get(field) is not None
+            )
+            attribs["type"] = str(attribs["type"]).upper()
+            attribs.setdefault("name", "@")
+
+            if self.key(attribs) not in keys:
+                keys.add(self.key(attribs))
+                desired.append(attribs)
+
+        return desired
+
+    @staticmethod
+    def differs(record, attribs):
+        """
+        Whether any of the extra fields asked for aren't what the record has
+        """
+
+        for field in RECORD_FIELDS[3:]:
+            if field in attribs and str(record.get(field)) != str(attribs[field]):
+                return True
+
+        return False
+
+    def diff(self, desired, existing):
+        """
+        Matches desired records to existing ones by (type, name, data), then pairs what's left of
+        each by (type, name) into updates, leaving the rest to create or (if pruning) destroy
+        """
+
+        prune = self.module.params["prune"]
+
+        current = {}
+
+        for record in existing:
+            if record["type"] != "SOA":
+                current.setdefault(self.key(record), []).append(record)
+
+        (creates, updates, unchanged) = ([], [], [])
+
+        for attribs in desired:
+
+            matches = current.get(self.key(attribs))
+
+            if not matches:
+                creates.append(attribs)
+            elif self.differs(matches[0], attribs):
+                updates.append((matches.pop(0), attribs))
+            else:
+                unchanged.append(matches.pop(0))
+
+        leftover = [record for records in current.values() for record in records]
+
+        # Only records being destroyed anyway (or that can't coexist) are reused for updates
+
+        pairable = {}
+
+        for record in leftover:
+            if prune or record["type"] in RECORD_SINGLES:
+                pairable.setdefault(self.key(record)[:2], []).append(record)
+
+        paired = set()
+        unpaired = []
+
+        for attribs in creates:
+
+            matches = pairable.get(self.key(attribs)[:2])
+
+            if matches:
+                record = matches.pop(0)
+                paired.add(record["id"])
+                updates.append((record, attribs))
+            else:
+                unpaired.append(attribs)
+
+        destroys = [
+            record for record in leftover if prune and record["id"] not in paired
+        ]
+
+        return (unpaired, updates, destroys, unchanged)
+
+    def change(self, change):
+        """
+        Makes one create, update or destroy, returning the error rather than raising it
+        """
+
+        (kind, record, attribs) = change
+        domain = self.module.params["name"]
+
+        try:
+            if kind == "create":
+                return (kind, self.do.domain.record_create(domain, attribs), None)
+            if kind == "update":
+                return (kind, self.do.domain.record_update(domain, record["id"], attribs), None)
+            self.do.domain.record_destroy(domain, record["id"])
+            return (kind, record, None)
+        except DOBOTOException as exception:
+            return (kind, record or attribs, failure(exception))
+
+    def sync(self, desired, **extra):
+        """
+        Makes the zone's records desired, exiting with what was done
+        """
+
+        (creates, updates, destroys, unchanged) = self.diff(
+            desired, self.do.domain.record_list(self.module.params["name"])
+        )
+
+        # Destroys and updates go first so creates don't collide with what they replace
+
+        results = self.map(
+            self.change,
+            [("destroy", record, None) for record in destroys] +
+            [("update", record, attribs) for (record, attribs) in updates],
+            self.module.params["concurrency"]
+        )
+
+        results.extend(self.map(
+            self.change,
+            [("create", None, attribs) for attribs in creates],
+            self.module.params["concurrency"]
+        ))
+
+        done = dict(create=[], update=[], destroy=[])
+        errors = []
+
+        for (kind, record, error) in results:
+            if error is None:
+                done[kind].append(record)
+            else:
+                errors.append({"action": kind, "record": record, "error": error})
+
+        if any(done.values()):
+            self.forget()
+
+        result = dict(
+            changed=any(done.values()),
+            created=done["create"],
+            updated=done["update"],
+            destroyed=done["destroy"],
+            unchanged=len(unchanged),
+            **extra
+        )
+
+        if errors:
+            self.module.fail_json(
+                msg="%s of %s record changes failed" % (len(errors), len(results)),
+                errors=errors, **result
+            )
+
+        self.module.exit_json(**result)
+
+    @require("name")
+    @require("records")
+    def records_sync(self):
+        self.sync(self.desired(self.module.params["records"]))
+
+    def forget(self):
+        """
+        Drops the zone's records from what record_find has in memory and on disk once they've
+        changed, so it doesn't find what's no longer there
+        """
+
+        name = self.module.params["name"].lower()
+
+        with ZONES_LOCK:
+            ZONES.pop((self.module.params["url"], self.token, name), None)
+
+        self.uncache("record_find", "domain_records", name)
+
+    def index(self):
+        """
+        Returns the zone's records indexed by relative name and by type, listing them (or
+        getting them from the cache) only once however many lookups this run makes
+        """
+
+        name = self.module.params["name"].lower()
+
+        with ZONES_LOCK:
+            zone = ZONES.setdefault(
+                (self.module.params["url"], self.token, name),
+                {"lock": threading.Lock(), "index": None}
+            )
+
+        with zone["lock"]:
+
+            if zone["index"] is None:
+
+                index = {"names": {}, "types": {}, "records": self.cached(
+                    "domain_records", self.do.domain.record_list, name
+                )}
+
+                for record in index["records"]:
+                    (type, relative, data) = self.key(record)
+                    index["names"].setdefault(relative, []).append(record)
+                    index["types"].setdefault(type, []).append(record)
+
+                zone["index"] = index
+
+        return zone["index"]
+
+    @require("name")
+    @require("record_name", "record_type", "record_data")
+    def record_find(self):
+
+        index = self.index()
+
+        type = self.module.params["record_type"]
+        name = self.module.params["record_name"]
+        data = self.module.params["record_data"]
+
+        if name is not None:
+            records = index["names"].get(self.relative(name), [])
+        elif type is not None:
+            records = index["types"].get(type.upper(), [])
+        else:
+            records = index["records"]
+
+        found = []
+
+        for record in records:
+
+            key = self.key(record)
+
+            if type is not None and key[0] != type.upper():
+                continue
+
+            if data is not None and key[2] != self.key(dict(type=key[0], data=data))[2]:
+                continue
+
+            found.append(record)
+
+        self.module.exit_json(changed=False, domain_records=found)
+
+    def zone(self, lines):
+        """
+        Yields the records of zone file lines as attribs, reading $ORIGIN and $TTL as it goes,
+        and collecting records of types DigitalOcean doesn't take in skipped
+        """
+
+        origin = "%s." % self.module.params["name"].lower()
+        (owner, ttl) = (origin, None)
+
+        for (inherit, tokens) in zone_entries(lines):
+
+            words = [token for (token, quoted) in tokens]
+            quoting = [quoted for (token, quoted) in tokens]
+            (directive, inherit) = (words[0].upper(), inherit and not words[0].startswith("$"))
+
+            if directive == "$ORIGIN":
+                origin = zone_absolute(words[1].lower(), origin)
+                continue
+
+            if directive == "$TTL":
+                ttl = zone_seconds(words[1])
+                continue
+
+            if directive.startswith("$"):
+                self.module.fail_json(msg="unsupported zone file directive: %s" % directive)
+
+            if not inherit:
+                owner = zone_absolute(words.pop(0).lower(), origin)
+
+            record_ttl = ttl
+
+            # TTL and class can come in either order, and both are optional
+
+            while words and (
+                words[0].upper() in ZONE_CLASSES or zone_seconds(words[0]) is not None
+            ):
+                word = words.pop(0)
+                if word.upper() not in ZONE_CLASSES:
+                    record_ttl = zone_seconds(word)
+
+            if not words:
+                self.module.fail_json(msg="zone file entry without a type: %s" % owner)
+
+            type = words.pop(0).upper()
+
+            attribs = {"type": type, "name": self.relative(owner)}
+
+            if record_ttl is not None:
+                attribs["ttl"] = record_ttl
+
+            try:
+                if type in ["A", "AAAA"]:
+                    attribs["data"] = words[0]
+                elif type in ["CNAME", "NS"]:
+                    attribs["data"] = zone_absolute(words[0], origin)
+                elif type == "MX":
+                    attribs.update(priority=int(words[0]), data=zone_absolute(words[1], origin))
+                elif type == "SRV":
+                    attribs.update(
+                        priority=int(words[0]), weight=int(words[1]), port=int(words[2]),
+                        data=zone_absolute(words[3], origin)
+                    )
+                elif type == "TXT":
+                    attribs["data"] = zone_txt(list(zip(words, quoting[-len(words):])))
+                elif type == "CAA":
+                    attribs.update(flags=int(words[0]), tag=words[1], data=words[2])
+                elif type == "SOA":
+                    continue
+                else:
+                    self.skipped.append({"type": type, "name": owner, "data": " ".join(words)})
+                    continue
+            except (IndexError, ValueError):
+                self.module.fail_json(msg="invalid %s record in zone file: %s %s" % (
+                    type, owner, " ".join(words)
+                ))
+
+            yield attribs
+
+    @require("name")
+    @require("path")
+    def zone_import(self):
+
+        self.skipped = []
+
+        path = os.path.expanduser(self.module.params["path"])
+
+        try:
+            with open(path) as lines:
+                desired = self.desired(self.zone(lines))
+        except IOError as exception:
+            self.module.fail_json(msg="unable to read %s: %s" % (path, exception))
+
+        self.sync(desired, skipped=self.skipped)
+
+    def zone_line(self, record):
+        """
+        Returns a record as a zone file line
+        """
+
+        origin = "%s." % self.module.params["name"].lower()
+        type = str(record["type"]).upper()
+        data = str(record.get("data"))
+
+        if type in RECORD_HOSTNAMES:
+            data = origin if data == "@" else data if data.endswith(".") else "%s." % data
+
+        if type == "MX":
+            data = "%s %s" % (record.get("priority"), data)
+        elif type == "SRV":
+            data = "%s %s %s %s" % (
+                record.get("priority"), record.get("weight"), record.get("port"), data
+            )
+        elif type == "TXT":
+            data = zone_text(data)
+        elif type == "CAA":
+            data = "%s %s %s" % (record.get("flags") or 0, record.get("tag"), zone_text(data))
+
+        return "%s\t%s\tIN\t%s\t%s\n" % (
+            self.relative(record.get("name")), record.get("ttl") or 1800, type, data
+        )
+
+    @require("name")
+    @require("path")
+    def zone_export(self):
+        """
+        Writes the zone a page of records at a time to a temporary file next to path, replacing
+        path only if it's different
+        """
+
+        path = os.path.expanduser(self.module.params["path"])
+        name = self.module.params["name"]
+        uri = "%s/%s/records" % (self.do.domain.uri, name)
+
+        temporary = os.path.join(os.path.dirname(os.path.abspath(path)), ".%s.%s" % (
+            os.path.basename(path), binascii.hexlify(os.urandom(4)).decode("ascii")
         ))
 
+        # Created with the mode a new file gets, leaving the umask to the kernel
+
+        try:
+            handle = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except OSError as exception:
+            self.module.fail_json(msg="unable to write %s: %s" % (path, exception))
+
+        digest = hashlib.sha256()
+        count = 0
+
+        try:
+
+            with os.fdopen(handle, "w") as zone:
+
+                def write(line):
+                    zone.write(line)
+                    digest.update(line.encode("utf-8"))
+
+                write("$ORIGIN %s.\n" % name.lower())
+
+                for record in self.pages(self.do.domain, "domain_records", uri=uri):
+
+                    # DigitalOcean manages the SOA itself and only returns part of it
+
+                    if record["type"] != "SOA":
+                        write(self.zone_line(record))
+                        count += 1
+
+            changed = True
+
+            if os.path.exists(path):
+
+                existing = hashlib.sha256()
+
+                with open(path, "rb") as previous:
+                    for chunk in iter(lambda: previous.read(65536), b""):
+                        existing.update(chunk)
+
+                changed = existing.hexdigest() != digest.hexdigest()
+
+            if changed:
+                os.rename(temporary, path)
+
+        except (IOError, OSError) as exception:
+            self.module.fail_json(msg="unable to write %s: %s" % (path, exception))
+
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        self.module.exit_json(changed=changed, path=path, records=count)
+
 
 if __name__ == '__main__':
     Domain()
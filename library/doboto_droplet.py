@@ -3,8 +3,14 @@
 
 import time
 import copy
+import string
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, DOBOTOModule, BATCH_CONCURRENCY, progress, failure
+
+try:
+    from doboto.exception import DOBOTOException, DOBOTONotFoundException
+except ImportError:
+    pass
 
 """
 Ansible module to manage DigitalOcean droplets
@@ -44,6 +50,7 @@ options:
             - droplet_neighbor_list
             - create
             - present
+            - fleet
             - info
             - destroy
             - backup_list
@@ -70,10 +77,18 @@ options:
 
     id:
         description: same as DO API variable (droplet id)
+    ids:
+        description: droplet ids to run the action on concurrently, waiting on all of them together
     name:
         description: same as DO API variable (for single create)
     names:
         description: same as DO API variable (for mass create)
+    count:
+        description: number of droplets with tag_name fleet should leave
+    template:
+        description: name for droplets fleet creates, with {tag} and {index} filled in, which it needs (default {tag}-{index})
+    concurrency:
+        description: most API calls to make at once when acting on many droplets (default 4)
     region:
         description: same as DO API variable
     size:
@@ -107,13 +122,37 @@ options:
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: longest interval between checks while waiting, which backs off up to it (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
     action_id:
         description: same as DO API variable (action id)
     url:
         description: URL to use if not official (for experimenting)
+    limit:
+        description: most results to return from list, only fetching the pages needed
+    page:
+        description: only return this page of results from list
+    per_page:
+        description: results per page when listing (default 200, or limit if lower)
+    stop:
+        description: JMESPath expression, list stops before the first result it's true for (requires jmespath)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
+    cache:
+        description: use, refresh or bypass (default) the on disk result cache
+        choices:
+            - use
+            - refresh
+            - bypass
+    cache_dir:
+        description: directory for the result cache (uses DOBOTO_CACHE_DIR from ENV or ~/.doboto/cache)
+    cache_ttl:
+        description: seconds a cached result stays fresh (defaults per resource type)
+    cache_size:
+        description: maximum bytes of the result cache before least recently used results are evicted
     extra:
         description: key / value of extra values to send (for experimenting)
 
@@ -185,6 +224,18 @@ EXAMPLES = '''
   vars:
     public_ipv6_query: "droplet.networks.v6[?type=='public'].ip_address | [0]"
 
+- name: droplet | fleet
+  doboto_droplet:
+    action: fleet
+    tag_name: web
+    count: 20
+    template: "web-{index:03d}"
+    region: nyc3
+    size: 1gb
+    image: ubuntu-14-04-x64
+    wait: true
+  register: droplet_fleet
+
 - name: droplet | info
   doboto_droplet:
     action: info
@@ -202,6 +253,18 @@ EXAMPLES = '''
     tag_name: some
   register: droplets_list_tag
 
+- name: droplet | list | fields
+  doboto_droplet:
+    action: list
+    fields: [id, name, image.slug, networks.v4]
+  register: droplets_list_fields
+
+- name: droplet | list | query
+  doboto_droplet:
+    action: list
+    query: "[?status=='active'].id"
+  register: droplets_list_query
+
 - name: droplet | action | list
   doboto_droplet:
     action: action_list
@@ -242,9 +305,24 @@ EXAMPLES = '''
     tag_name: some
     wait: true
   register: multiple_power_off
+
+- name: droplet_action | ids | reboot
+  doboto_droplet:
+    action: reboot
+    ids:
+      - 1234
+      - 5678
+    concurrency: 10
+    wait: true
+  register: ids_reboot
 '''
 
 
+# Most names the API takes in one create
+
+FLEET_CHUNK = 10
+
+
 class Droplet(DOBOTOModule):
 
     def input(self):
@@ -256,6 +334,7 @@ class Droplet(DOBOTOModule):
                 "droplet_neighbor_list",
                 "create",
                 "present",
+                "fleet",
                 "info",
                 "destroy",
                 "backup_list",
@@ -282,8 +361,12 @@ class Droplet(DOBOTOModule):
             ]),
             token=dict(default=None, no_log=True),
             id=dict(default=None),
+            ids=dict(default=None, type='list'),
             name=dict(default=None),
             names=dict(default=None, type='list'),
+            count=dict(default=None, type='int'),
+            template=dict(default="{tag}-{index}"),
+            concurrency=dict(default=BATCH_CONCURRENCY, type='int'),
             region=dict(default=None),
             size=dict(default=None),
             disk=dict(default=None, type='bool'),
@@ -304,6 +387,16 @@ class Droplet(DOBOTOModule):
             timeout=dict(default=300, type='int'),
             action_id=dict(default=None),
             url=dict(default=self.url),
+            limit=dict(default=None, type='int'),
+            page=dict(default=None, type='int'),
+            per_page=dict(default=None, type='int'),
+            stop=dict(default=None),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            cache=dict(default="bypass", choices=["use", "refresh", "bypass"]),
+            cache_dir=dict(default=None),
+            cache_ttl=dict(default=None, type='int'),
+            cache_size=dict(default=None, type='int'),
             extra=dict(default=None, type='dict'),
         ))
 
@@ -338,9 +431,9 @@ class Droplet(DOBOTOModule):
             getattr(self, self.module.params["action"])()
 
     def list(self):
-        self.module.exit_json(changed=False, droplets=self.do.droplet.list(
-            tag_name=self.module.params["tag_name"])
-        )
+        self.module.exit_json(changed=False, droplets=self.paginate(
+            self.do.droplet, "droplets", {"tag_name": self.module.params["tag_name"]}
+        ))
 
     def droplet_neighbor_list(self):
         self.module.exit_json(changed=False, neighbors=self.do.droplet.droplet_neighbor_list())
@@ -352,7 +445,8 @@ class Droplet(DOBOTOModule):
             key = self.module.params["action"]
 
         self.module.exit_json(changed=False,
-            **{key: getattr(self.do.droplet, self.module.params["action"])(
+            **{key: self.cached(
+               key, getattr(self.do.droplet, self.module.params["action"]),
                self.module.params["id"]
             )}
         )
@@ -387,25 +481,35 @@ class Droplet(DOBOTOModule):
         if self.module.params["name"] is not None:
 
             attribs["name"] = self.module.params["name"]
-            droplet = self.do.droplet.create(
-                attribs,
-                self.module.params["wait"],
-                self.module.params["poll"],
-                self.module.params["timeout"]
-            )
+            droplet = self.wait_droplet(self.do.droplet.create(attribs), attribs)
             self.module.exit_json(changed=True, droplet=droplet)
 
         elif self.module.params["names"] is not None:
 
             attribs["names"] = self.module.params["names"]
-            droplets = self.do.droplet.create(
-                attribs,
-                self.module.params["wait"],
-                self.module.params["poll"],
-                self.module.params["timeout"]
-            )
+            droplets = self.wait_droplets(self.do.droplet.create(attribs), attribs)
             self.module.exit_json(changed=True, droplets=droplets)
 
+    def wait_droplet(self, droplet, attribs):
+        return self.wait(
+            droplet,
+            lambda droplet: self.do.droplet.info(droplet["id"]),
+            lambda droplet: self.do.droplet.ready(droplet, attribs),
+            "droplet_create"
+        )
+
+    def wait_droplets(self, droplets, attribs):
+        return self.wait(
+            droplets,
+            lambda droplets: [
+                droplet if self.do.droplet.ready(droplet, attribs)
+                else self.do.droplet.info(droplet["id"])
+                for droplet in droplets
+            ],
+            lambda droplets: all(self.do.droplet.ready(droplet, attribs) for droplet in droplets),
+            "droplet_create"
+        )
+
     @require("name", "names")
     @require("region")
     @require("size")
@@ -417,25 +521,166 @@ class Droplet(DOBOTOModule):
         if self.module.params["name"] is not None:
 
             attribs["name"] = self.module.params["name"]
-            (droplet, created) = self.do.droplet.present(
-                attribs,
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            )
+            (droplet, created) = self.do.droplet.present(attribs)
+
+            if created is not None:
+                droplet = created = self.wait_droplet(created, attribs)
+
             self.module.exit_json(changed=(created is not None), droplet=droplet, created=created)
 
         elif self.module.params["names"] is not None:
 
             attribs["names"] = self.module.params["names"]
-            (droplets, created) = self.do.droplet.present(
-                attribs,
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            )
+            (droplets, created) = self.do.droplet.present(attribs)
+
+            created = self.wait_droplets(created, attribs)
+            waited = {droplet["id"]: droplet for droplet in created}
+            droplets = [waited.get(droplet["id"], droplet) for droplet in droplets]
+
             self.module.exit_json(changed=(len(created) > 0), droplets=droplets, created=created)
 
+    @require("tag_name")
+    @require("count")
+    @require("region")
+    @require("size")
+    @require("image")
+    def fleet(self):
+        """
+        Brings the droplets with tag_name to count, creating the shortfall in bulk calls of ten
+        names, or destroying the newest surplus, all concurrently
+        """
+
+        tag_name = self.module.params["tag_name"]
+
+        if self.module.params["count"] < 0:
+            self.module.fail_json(msg="count can't be negative")
+
+        template = self.module.params["template"]
+
+        try:
+            fields = [field for (_, field, _, _) in string.Formatter().parse(template) if field]
+            template.format(tag=tag_name, index=1)
+        except (KeyError, IndexError, ValueError) as exception:
+            self.module.fail_json(msg="invalid template %s: %s" % (template, exception))
+
+        if "index" not in fields:
+            self.module.fail_json(msg="template %s needs {index} to name droplets apart" % template)
+
+        attribs = self.attribs()
+        attribs["tags"] = list(set((attribs["tags"] or []) + [tag_name]))
+
+        droplets = self.do.droplet.list(tag_name=tag_name)
+        created = []
+        destroyed = []
+
+        if len(droplets) < self.module.params["count"]:
+
+            names = self.fleet_names(
+                set(droplet["name"] for droplet in droplets),
+                self.module.params["count"] - len(droplets)
+            )
+
+            def create(names):
+                try:
+                    return {"droplets": self.do.droplet.create(dict(attribs, names=names))}
+                except DOBOTOException as exception:
+                    return {"names": names, "error": failure(exception)}
+
+            chunks = self.map(
+                create,
+                [names[start:start + FLEET_CHUNK] for start in range(0, len(names), FLEET_CHUNK)],
+                self.module.params["concurrency"]
+            )
+
+            for chunk in chunks:
+                created.extend(chunk.get("droplets", []))
+
+            errors = [chunk for chunk in chunks if "error" in chunk]
+
+            if errors:
+                self.module.fail_json(
+                    msg="%s of %s create calls failed" % (len(errors), len(chunks)),
+                    changed=bool(created), created=[droplet["id"] for droplet in created],
+                    errors=errors
+                )
+
+            created = self.wait_fleet(created, attribs)
+            droplets.extend(created)
+
+        elif len(droplets) > self.module.params["count"]:
+
+            droplets.sort(key=lambda droplet: droplet["id"])
+            surplus = droplets[self.module.params["count"]:]
+            droplets = droplets[:self.module.params["count"]]
+
+            def destroy(droplet):
+                try:
+                    self.do.droplet.destroy(id=droplet["id"])
+                    return {"droplet": droplet}
+                except DOBOTOException as exception:
+                    return {"id": droplet["id"], "error": failure(exception)}
+
+            results = self.map(destroy, surplus, self.module.params["concurrency"])
+
+            destroyed = [result["droplet"] for result in results if "droplet" in result]
+            errors = [result for result in results if "error" in result]
+
+            if errors:
+                self.module.fail_json(
+                    msg="%s of %s destroy calls failed" % (len(errors), len(results)),
+                    changed=bool(destroyed), droplets=droplets, created=created,
+                    destroyed=destroyed, errors=errors
+                )
+
+        self.module.exit_json(
+            changed=bool(created or destroyed),
+            droplets=droplets,
+            created=created,
+            destroyed=destroyed
+        )
+
+    def fleet_names(self, used, needed):
+        """
+        Returns needed names from the template that aren't used yet, failing if it can't
+        """
+
+        template = self.module.params["template"]
+
+        names = []
+
+        # Each used name can take up at most one index, so that many more is always enough
+
+        for index in range(1, len(used) + needed + 1):
+
+            name = template.format(tag=self.module.params["tag_name"], index=index)
+
+            if name not in used and name not in names:
+                names.append(name)
+
+            if len(names) == needed:
+                return names
+
+        self.module.fail_json(msg="template %s only gave %s new names" % (template, len(names)))
+
+    def wait_fleet(self, droplets, attribs):
+        """
+        Waits on droplets that share a tag with one listing of the tag per check
+        """
+
+        def refresh(droplets):
+            listed = dict(
+                (droplet["id"], droplet)
+                for droplet in self.do.droplet.list(tag_name=self.module.params["tag_name"])
+            )
+            return [listed.get(droplet["id"], droplet) for droplet in droplets]
+
+        return self.wait(
+            droplets,
+            refresh,
+            lambda droplets: all(self.do.droplet.ready(droplet, attribs) for droplet in droplets),
+            "droplet_create"
+        )
+
     @require("id")
     def info(self):
         self.module.exit_json(changed=False, droplet=self.do.droplet.info(
@@ -448,97 +693,112 @@ class Droplet(DOBOTOModule):
             id=self.module.params["id"], tag_name=self.module.params["tag_name"]
         ))
 
+    def each(self, call):
+        """
+        Runs call with the id parameter, or with every one of the ids concurrently, then waits on
+        the resulting actions all together
+        """
+
+        if self.module.params["ids"] is None:
+            self.module.exit_json(changed=True, action=self.wait_action(
+                call(self.module.params["id"])
+            ))
+
+        def start(id):
+            try:
+                return {"id": id, "action": call(id)}
+            except DOBOTONotFoundException:
+                return {"id": id, "error": "not found"}
+            except DOBOTOException as exception:
+                return {"id": id, "error": exception.result}
+
+        results = self.map(start, self.module.params["ids"], self.module.params["concurrency"])
+
+        actions = self.wait_actions(
+            [result["action"] for result in results if "action" in result], listing=True
+        )
+        waited = dict((action["id"], action) for action in actions)
+
+        for result in results:
+            if "action" in result:
+                result["action"] = waited[result["action"]["id"]]
+
+        failed = [result for result in results if "error" in result]
+
+        if failed:
+            self.module.fail_json(
+                msg="%s of %s droplets failed" % (len(failed), len(results)),
+                changed=len(actions) > 0, actions=actions, droplet_actions=results,
+                progress=progress(actions)
+            )
+
+        self.module.exit_json(
+            changed=True, actions=actions, droplet_actions=results, progress=progress(actions)
+        )
+
     def action(self, tagless=False):
 
-        if self.module.params["id"] is not None:
+        call = getattr(self.do.droplet, self.module.params["action"])
 
-            self.module.exit_json(changed=True, action=getattr(
-                self.do.droplet,
-                self.module.params["action"]
-            )(
-                id=self.module.params["id"],
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            ))
+        if self.module.params["id"] is not None or self.module.params["ids"] is not None:
+
+            self.each(lambda id: call(id=id))
 
         elif not tagless and self.module.params["tag_name"] is not None:
 
-            self.module.exit_json(changed=True, actions=getattr(
-                self.do.droplet,
-                self.module.params["action"]
-            )(
-                tag_name=self.module.params["tag_name"],
-                wait=self.module.params["wait"],
-                poll=self.module.params["poll"],
-                timeout=self.module.params["timeout"]
-            ))
+            actions = self.wait_actions(call(tag_name=self.module.params["tag_name"]), listing=True)
+
+            self.module.exit_json(changed=True, actions=actions, progress=progress(actions))
 
         else:
 
-            self.module.fail_json(msg="the id or tag_name parameter is required")
+            self.module.fail_json(msg="the id, ids or tag_name parameter is required")
 
-    @require("id")
+    @require("id", "ids")
     @require("image")
     def restore(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.restore(
-            self.module.params["id"], self.module.params["image"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.each(lambda id: self.do.droplet.restore(id, self.module.params["image"]))
 
-    @require("id")
+    @require("id", "ids")
     @require("size")
     def resize(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.resize(
-            self.module.params["id"], self.module.params["size"], self.module.params["disk"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
+        self.each(lambda id: self.do.droplet.resize(
+            id, self.module.params["size"], self.module.params["disk"]
         ))
 
-    @require("id")
+    @require("id", "ids")
     @require("image")
     def rebuild(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.rebuild(
-            self.module.params["id"], self.module.params["image"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.each(lambda id: self.do.droplet.rebuild(id, self.module.params["image"]))
 
-    @require("id")
+    @require("id", "ids")
     @require("name")
     def rename(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.rename(
-            self.module.params["id"], self.module.params["name"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.each(lambda id: self.do.droplet.rename(id, self.module.params["name"]))
 
-    @require("id")
+    @require("id", "ids")
     @require("kernel")
     def kernel_update(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.kernel_update(
-            self.module.params["id"], self.module.params["kernel"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.each(lambda id: self.do.droplet.kernel_update(id, self.module.params["kernel"]))
 
-    @require("id", "tag_name")
+    @require("id", "ids", "tag_name")
     @require("snapshot_name")
     def snapshot_create(self):
-        self.module.exit_json(changed=True, action=self.do.droplet.snapshot_create(
-            id=self.module.params["id"],
-            tag_name=self.module.params["tag_name"],
-            snapshot_name=self.module.params["snapshot_name"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+
+        if self.module.params["id"] is not None or self.module.params["ids"] is not None:
+            self.each(lambda id: self.do.droplet.snapshot_create(
+                id=id, snapshot_name=self.module.params["snapshot_name"]
+            ))
+
+        actions = self.wait_actions(
+            self.do.droplet.snapshot_create(
+                tag_name=self.module.params["tag_name"],
+                snapshot_name=self.module.params["snapshot_name"]
+            ),
+            listing=True
+        )
+
+        self.module.exit_json(changed=True, action=actions, progress=progress(actions))
 
     @require("id")
     @require("action_id")
@@ -1,7 +1,6 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import time
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.doboto_module import require, DOBOTOModule
 
@@ -70,6 +69,12 @@ options:
     url:
         description:
             - URL to use if not official (for experimenting)
+    fields:
+        description:
+            - only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description:
+            - JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -178,7 +183,9 @@ class FloatingIP(DOBOTOModule):
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
             action_id=dict(default=None),
-            url=dict(default=self.url)
+            url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None)
         ))
 
     def list(self):
@@ -187,27 +194,20 @@ class FloatingIP(DOBOTOModule):
     @require("droplet_id", "region")
     def create(self):
 
-        floating_ip = self.do.floating_ip.create(
-            droplet_id=self.module.params["droplet_id"],
-            region=self.module.params["region"]
+        floating_ip = self.wait(
+            self.do.floating_ip.create(
+                droplet_id=self.module.params["droplet_id"],
+                region=self.module.params["region"]
+            ),
+            lambda floating_ip: self.do.floating_ip.info(floating_ip["ip"]),
+            lambda floating_ip: (
+                self.module.params["droplet_id"] is None or floating_ip["droplet"] is not None
+            ) and (
+                self.module.params["region"] is None or floating_ip["region"] is not None
+            ),
+            "floating_ip_create"
         )
 
-        start_time = time.time()
-
-        while self.module.params["wait"] and \
-              (self.module.params["droplet_id"] is None or floating_ip["droplet"]) is None and \
-              (self.module.params["region"] is None or floating_ip["region"] is None):
-
-            time.sleep(self.module.params["poll"])
-
-            try:
-                floating_ip = self.do.floating_ip.info(floating_ip["ip"])
-            except:
-                pass
-
-            if time.time() - start_time > self.module.params["timeout"]:
-                self.module.fail_json(msg="Timeout on polling", floating_ip=floating_ip)
-
         self.module.exit_json(changed=True, floating_ip=floating_ip)
 
     @require("ip")
@@ -225,21 +225,15 @@ class FloatingIP(DOBOTOModule):
     @require("ip")
     @require("droplet_id")
     def assign(self):
-        self.module.exit_json(changed=True, action=self.do.floating_ip.assign(
-            self.module.params["ip"], self.module.params["droplet_id"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.floating_ip.assign(
+            self.module.params["ip"], self.module.params["droplet_id"]
+        )))
 
     @require("ip")
     def unassign(self):
-        self.module.exit_json(changed=True, action=self.do.floating_ip.unassign(
-            self.module.params["ip"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.floating_ip.unassign(
+            self.module.params["ip"]
+        )))
 
     @require("ip")
     def action_list(self):
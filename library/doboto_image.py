@@ -61,13 +61,37 @@ options:
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: longest interval between checks while waiting, which backs off up to it (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
     action_id:
         description: same as DO API variable (action id)
     url:
         description: URL to use if not official (for experimenting)
+    limit:
+        description: most results to return from list, only fetching the pages needed
+    page:
+        description: only return this page of results from list
+    per_page:
+        description: results per page when listing (default 200, or limit if lower)
+    stop:
+        description: JMESPath expression, list stops before the first result it's true for (requires jmespath)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
+    cache:
+        description: use, refresh or bypass (default) the on disk result cache
+        choices:
+            - use
+            - refresh
+            - bypass
+    cache_dir:
+        description: directory for the result cache (uses DOBOTO_CACHE_DIR from ENV or ~/.doboto/cache)
+    cache_ttl:
+        description: seconds a cached result stays fresh (defaults per resource type)
+    cache_size:
+        description: maximum bytes of the result cache before least recently used results are evicted
 
 '''
 
@@ -187,11 +211,22 @@ class Image(DOBOTOModule):
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
             action_id=dict(default=None),
-            url=dict(default=self.url)
+            url=dict(default=self.url),
+            limit=dict(default=None, type='int'),
+            page=dict(default=None, type='int'),
+            per_page=dict(default=None, type='int'),
+            stop=dict(default=None),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            cache=dict(default="bypass", choices=["use", "refresh", "bypass"]),
+            cache_dir=dict(default=None),
+            cache_ttl=dict(default=None, type='int'),
+            cache_size=dict(default=None, type='int'),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, images=self.do.image.list(
+        self.module.exit_json(changed=False, images=self.cached(
+            "images", lambda **params: self.paginate(self.do.image, "images", params),
             type=self.module.params["type"],
             private=('true' if self.module.params["private"] else 'false')
         ))
@@ -217,22 +252,16 @@ class Image(DOBOTOModule):
 
     @require("id")
     def convert(self):
-        self.module.exit_json(changed=True, action=self.do.image.convert(
-            self.module.params["id"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.image.convert(
+            self.module.params["id"]
+        )))
 
     @require("id")
     @require("region")
     def transfer(self):
-        self.module.exit_json(changed=True, action=self.do.image.transfer(
-            self.module.params["id"], self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.image.transfer(
+            self.module.params["id"], self.module.params["region"]
+        )))
 
     @require("id")
     def action_list(self):
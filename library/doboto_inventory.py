@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.doboto_module import DOBOTOModule
+
+"""
+Ansible module to gather a joined inventory of a DigitalOcean account
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+DOCUMENTATION = '''
+---
+module: doboto_inventory
+
+short_description: Gather a DigitalOcean Inventory
+description:
+    - Fetches droplets along with floating IPs, volumes, load balancers, tags and snapshots all at once
+    - Joins them into the doboto_inventory fact, each collection keyed by id and each droplet listing what's attached to it
+version_added: "0.6"
+author: "SWE Data <swe-data@do.co>"
+options:
+    token:
+        description: token to use to connect to the API (uses DO_API_TOKEN from ENV if not found)
+    action:
+        description: inventory action
+        choices:
+            - gather
+    resources:
+        description: collections to join to the droplets (default all of them)
+        choices:
+            - floating_ips
+            - volumes
+            - load_balancers
+            - tags
+            - snapshots
+    tag_name:
+        description: only include droplets with this tag
+    concurrency:
+        description: collections to fetch at once (default 6)
+    url:
+        description: URL to use if not official (for experimenting)
+'''
+
+EXAMPLES = '''
+- name: inventory | gather
+  doboto_inventory:
+
+- name: inventory | droplets behind load balancers
+  debug:
+    msg: "{{ doboto_inventory.droplets.values()|selectattr('load_balancers')|map(attribute='name')|list }}"
+
+- name: inventory | gather | web
+  doboto_inventory:
+    tag_name: web
+    resources:
+      - floating_ips
+      - load_balancers
+'''
+
+RETURN = '''
+ansible_facts:
+    description: the doboto_inventory fact
+    returned: success
+    type: complex
+    contains:
+        doboto_inventory:
+            description: droplets, floating_ips, volumes, load_balancers, snapshots keyed by id (or ip), and tags by name with their droplet ids
+'''
+
+# Collection name to DOBOTO endpoint and the key the API returns them under
+
+COLLECTIONS = {
+    "droplets": ("droplet", "droplets"),
+    "floating_ips": ("floating_ip", "floating_ips"),
+    "volumes": ("volume", "volumes"),
+    "load_balancers": ("load_balancer", "load_balancers"),
+    "tags": ("tag", "tags"),
+    "snapshots": ("snapshot", "snapshots")
+}
+
+RESOURCES = ["floating_ips", "volumes", "load_balancers", "tags", "snapshots"]
+
+# Collections listed on each droplet by id, tags already being there by name
+
+JOINED = ["floating_ips", "volumes", "load_balancers", "snapshots"]
+
+
+class Inventory(DOBOTOModule):
+
+    def input(self):
+        return AnsibleModule(argument_spec=dict(
+            action=dict(default="gather", choices=[
+                "gather"
+            ]),
+            token=dict(default=None, no_log=True),
+            resources=dict(default=RESOURCES, type='list'),
+            tag_name=dict(default=None),
+            concurrency=dict(default=len(COLLECTIONS), type='int'),
+            url=dict(default=self.url),
+        ))
+
+    def fetch(self, collection):
+        """
+        Gets every page of one collection
+        """
+
+        (endpoint, key) = COLLECTIONS[collection]
+
+        params = None
+
+        if collection == "droplets":
+            params = {"tag_name": self.module.params["tag_name"]}
+
+        return (collection, list(self.pages(getattr(self.do, endpoint), key, params)))
+
+    @staticmethod
+    def address(droplet, kind):
+
+        for network in droplet.get("networks", {}).get("v4", []):
+            if network.get("type") == kind:
+                return network["ip_address"]
+
+        return None
+
+    @staticmethod
+    def slug(value):
+
+        if isinstance(value, dict):
+            return value.get("slug") or value.get("name")
+
+        return value
+
+    def join(self, collections):
+        """
+        Indexes each collection and lists what's attached to each droplet on the droplet
+        """
+
+        inventory = {"droplets": {}}
+        droplets = inventory["droplets"]
+
+        for droplet in collections["droplets"]:
+            droplets[str(droplet["id"])] = dict(
+                id=droplet["id"],
+                name=droplet["name"],
+                status=droplet.get("status"),
+                region=self.slug(droplet.get("region")),
+                size=droplet.get("size_slug"),
+                image=self.slug(droplet.get("image")),
+                public_ip=self.address(droplet, "public"),
+                private_ip=self.address(droplet, "private"),
+                tags=droplet.get("tags", []),
+                **{collection: [] for collection in collections if collection in JOINED}
+            )
+
+        def attach(collection, droplet_id, key):
+            if str(droplet_id) in droplets:
+                droplets[str(droplet_id)][collection].append(key)
+
+        if "floating_ips" in collections:
+
+            inventory["floating_ips"] = {}
+
+            for floating_ip in collections["floating_ips"]:
+
+                droplet_id = (floating_ip.get("droplet") or {}).get("id")
+
+                inventory["floating_ips"][floating_ip["ip"]] = dict(
+                    ip=floating_ip["ip"],
+                    region=self.slug(floating_ip.get("region")),
+                    droplet_id=droplet_id
+                )
+
+                attach("floating_ips", droplet_id, floating_ip["ip"])
+
+        if "volumes" in collections:
+
+            inventory["volumes"] = {}
+
+            for volume in collections["volumes"]:
+
+                inventory["volumes"][volume["id"]] = dict(
+                    id=volume["id"],
+                    name=volume.get("name"),
+                    region=self.slug(volume.get("region")),
+                    size_gigabytes=volume.get("size_gigabytes"),
+                    droplet_ids=volume.get("droplet_ids") or []
+                )
+
+                for droplet_id in volume.get("droplet_ids") or []:
+                    attach("volumes", droplet_id, volume["id"])
+
+        if "load_balancers" in collections:
+
+            inventory["load_balancers"] = {}
+
+            for load_balancer in collections["load_balancers"]:
+
+                inventory["load_balancers"][load_balancer["id"]] = dict(
+                    id=load_balancer["id"],
+                    name=load_balancer.get("name"),
+                    ip=load_balancer.get("ip"),
+                    status=load_balancer.get("status"),
+                    region=self.slug(load_balancer.get("region")),
+                    tag=load_balancer.get("tag"),
+                    droplet_ids=load_balancer.get("droplet_ids") or []
+                )
+
+                for droplet_id in load_balancer.get("droplet_ids") or []:
+                    attach("load_balancers", droplet_id, load_balancer["id"])
+
+        if "snapshots" in collections:
+
+            inventory["snapshots"] = {}
+
+            for snapshot in collections["snapshots"]:
+
+                inventory["snapshots"][str(snapshot["id"])] = dict(
+                    id=snapshot["id"],
+                    name=snapshot.get("name"),
+                    resource_id=snapshot.get("resource_id"),
+                    resource_type=snapshot.get("resource_type"),
+                    size_gigabytes=snapshot.get("size_gigabytes"),
+                    created_at=snapshot.get("created_at")
+                )
+
+                if snapshot.get("resource_type") == "droplet":
+                    attach("snapshots", snapshot["resource_id"], snapshot["id"])
+
+        if "tags" in collections:
+
+            inventory["tags"] = dict((tag["name"], []) for tag in collections["tags"])
+
+            for droplet in droplets.values():
+                for tag in droplet["tags"]:
+                    inventory["tags"].setdefault(tag, []).append(droplet["id"])
+
+        return inventory
+
+    def gather(self):
+
+        unknown = [
+            resource for resource in self.module.params["resources"] if resource not in RESOURCES
+        ]
+
+        if unknown:
+            self.module.fail_json(msg="unknown resources: %s" % ", ".join(unknown))
+
+        collections = dict(self.map(
+            self.fetch,
+            ["droplets"] + list(set(self.module.params["resources"])),
+            self.module.params["concurrency"]
+        ))
+
+        self.module.exit_json(changed=False, ansible_facts=dict(
+            doboto_inventory=self.join(collections)
+        ))
+
+
+if __name__ == '__main__':
+    Inventory()
@@ -1,8 +1,9 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import time
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, DOBOTOModule, Poller, POLL_HINTS, CHUNK_SIZE
 
 """
 Ansible module to manage DigitalOcean load balancers
@@ -28,7 +29,10 @@ DOCUMENTATION = '''
 module: doboto_load_balancer
 
 short_description: Manage DigitalOcean load balancers
-description: Manages DigitalOcean Load Balancers
+description:
+    - Manages DigitalOcean Load Balancers
+    - update, and present when the load balancer's already there, only change what's different from the load balancer as it is, adding and removing droplets and forwarding rules by themselves and waiting for it to be active again between each, putting the whole load balancer only when another setting changes (listed in changes.settings), and return what they did in changes
+    - cutover switches to a tag with a single update, or to droplets by adding them, waiting for the load balancer to be active again, then removing the rest, and returns the seconds it took as window
 version_added: "0.6.0"
 author: "SWE Data <swe-data@do.co>"
 options:
@@ -47,6 +51,8 @@ options:
             - droplet_remove
             - forwarding_rule_add
             - forwarding_rule_remove
+            - droplets_sync
+            - cutover
     id:
         description: same as DO API variable
     name:
@@ -66,15 +72,23 @@ options:
     droplet_ids:
         description: same as DO API variable
     tag:
-        description: same as DO API variable
+        description: same as DO API variable, with cutover the tag to switch the load balancer to
+    tag_name:
+        description: with droplets_sync and cutover, droplets with this tag are those the load balancer should have (along with any droplet_ids)
+    chunk_size:
+        description: most droplets to add or remove per request with droplets_sync, which waits for the load balancer to be active again after each (default 100)
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: longest interval between checks while waiting, which backs off up to it (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -191,6 +205,15 @@ EXAMPLES = '''
     wait: true
   register: load_balancer_update_droplets
 
+- name: load_balancer | update | incremental
+  doboto_load_balancer:
+    action: update
+    id: "{{ load_balancer_create_droplets.load_balancer.id }}"
+    droplet_ids:
+      - "{{ load_balancer_droplet_create.droplets[1].id }}"
+      - "{{ load_balancer_droplet_create.droplets[2].id }}"
+  register: load_balancer_update_incremental
+
 - name: load_balancer | droplet_add
   doboto_load_balancer:
     action: droplet_add
@@ -228,8 +251,42 @@ EXAMPLES = '''
         target_protocol: http
         target_port: 8080
   register: load_balancer_forwarding_rule_remove
+
+- name: load_balancer | droplets_sync | tag
+  doboto_load_balancer:
+    action: droplets_sync
+    id: "{{ load_balancer_create_droplets.load_balancer.id }}"
+    tag_name: web
+    wait: true
+  register: load_balancer_droplets_sync
+
+- name: load_balancer | cutover | green
+  doboto_load_balancer:
+    action: cutover
+    id: "{{ load_balancer_create_droplets.load_balancer.id }}"
+    tag_name: green
+  register: load_balancer_cutover
+
+- name: load_balancer | cutover | green | window
+  debug:
+    msg: "{{ load_balancer_cutover.window }}"
 '''
 
+# Forwarding rule fields, with what the API fills in for those left out
+
+RULE_FIELDS = [
+    ("entry_protocol", None),
+    ("entry_port", None),
+    ("target_protocol", None),
+    ("target_port", None),
+    ("certificate_id", ""),
+    ("tls_passthrough", False)
+]
+
+# Settings that can only be changed by putting the whole load balancer
+
+SETTINGS = ["name", "algorithm", "health_check", "sticky_sessions", "redirect_http_to_https", "tag"]
+
 
 class LoadBalancer(DOBOTOModule):
 
@@ -245,7 +302,9 @@ class LoadBalancer(DOBOTOModule):
                 "droplet_add",
                 "droplet_remove",
                 "forwarding_rule_add",
-                "forwarding_rule_remove"
+                "forwarding_rule_remove",
+                "droplets_sync",
+                "cutover"
             ]),
             token=dict(default=None, no_log=True),
             id=dict(default=None),
@@ -258,11 +317,15 @@ class LoadBalancer(DOBOTOModule):
             redirect_http_to_https=dict(default=None, type='bool'),
             droplet_ids=dict(default=None, type='list'),
             tag=dict(default=None),
+            tag_name=dict(default=None),
+            chunk_size=dict(default=CHUNK_SIZE, type='int'),
             wait=dict(default=False, type='bool'),
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
-            url=dict(default=self.url)
-        ))
+            url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None)
+        ), mutually_exclusive=[["tag", "droplet_ids"], ["tag", "tag_name"]])
 
     def list(self):
         self.module.exit_json(changed=False, load_balancers=self.do.load_balancer.list())
@@ -291,13 +354,18 @@ class LoadBalancer(DOBOTOModule):
 
         attribs = self.attribs()
 
-        self.module.exit_json(changed=True, load_balancer=self.do.load_balancer.create(
-            attribs,
-            self.module.params["wait"],
-            self.module.params["poll"],
-            self.module.params["timeout"]
+        self.module.exit_json(changed=True, load_balancer=self.wait_load_balancer(
+            self.do.load_balancer.create(attribs)
         ))
 
+    def wait_load_balancer(self, load_balancer):
+        return self.wait(
+            load_balancer,
+            lambda load_balancer: self.do.load_balancer.info(load_balancer["id"]),
+            lambda load_balancer: load_balancer["ip"],
+            "load_balancer_create"
+        )
+
     @require("name")
     @require("region")
     @require("forwarding_rules")
@@ -305,14 +373,18 @@ class LoadBalancer(DOBOTOModule):
 
         attribs = self.attribs()
 
-        (load_balancer, created) = self.do.load_balancer.present(
-            attribs,
-            self.module.params["wait"],
-            self.module.params["poll"],
-            self.module.params["timeout"]
-        )
+        (load_balancer, created) = self.do.load_balancer.present(attribs)
+
+        if created is not None:
+            load_balancer = created = self.wait_load_balancer(created)
+            self.module.exit_json(changed=True, load_balancer=load_balancer, created=created)
+
+        # One that's there already is brought in line the way update does it
+
+        (changes, load_balancer) = self.converge(load_balancer)
+
         self.module.exit_json(
-            changed=(created is not None), load_balancer=load_balancer, created=created
+            changed=bool(changes), changes=changes, load_balancer=load_balancer, created=None
         )
 
     @require("id")
@@ -321,17 +393,195 @@ class LoadBalancer(DOBOTOModule):
             self.module.params["id"]
         ))
 
+    @staticmethod
+    def rule(rule):
+        """
+        Returns a forwarding rule as something to compare, with the API's defaults filled in
+        """
+
+        return tuple(
+            str(rule.get(field) if rule.get(field) is not None else default).lower()
+            for (field, default) in RULE_FIELDS
+        )
+
+    @staticmethod
+    def differs(desired, current):
+        """
+        Whether desired has anything different from current, only comparing the keys given
+        """
+
+        if isinstance(desired, dict) and isinstance(current, dict):
+            return any(
+                LoadBalancer.differs(value, current.get(key)) for (key, value) in desired.items()
+            )
+
+        return str(desired).lower() != str(current).lower()
+
+    @staticmethod
+    def spec(load_balancer):
+        """
+        Returns what to put to keep the load balancer as it is, as the API resets anything left out
+        """
+
+        attribs = dict(
+            (field, load_balancer[field])
+            for field in SETTINGS + ["forwarding_rules", "droplet_ids"] if field in load_balancer
+        )
+        attribs["region"] = load_balancer["region"]["slug"]
+
+        return attribs
+
+    def droplet_ids(self):
+        """
+        Returns the droplet_ids parameter as numbers, failing on any that aren't
+        """
+
+        try:
+            return [int(droplet_id) for droplet_id in self.module.params["droplet_ids"] or []]
+        except (TypeError, ValueError):
+            self.module.fail_json(
+                msg="droplet_ids must be numbers, not %s" % self.module.params["droplet_ids"]
+            )
+
+    def converge(self, current):
+        """
+        Changes only what's different from the load balancer as it is, adding and removing
+        droplets and forwarding rules by themselves, waiting for it to be active again between
+        each, and only putting the whole load balancer when one of its settings is different,
+        returning what changed and the load balancer after
+        """
+
+        settings = [
+            setting for setting in SETTINGS
+            if self.module.params[setting] is not None and
+            self.differs(self.module.params[setting], current.get(setting))
+        ]
+
+        # Droplets can't be added to a load balancer by tag, so moving off a tag needs a put
+
+        if self.module.params["droplet_ids"] is not None and current.get("tag"):
+            settings.append("droplet_ids")
+
+        droplet_add = []
+        droplet_remove = []
+
+        if self.module.params["droplet_ids"] is not None:
+
+            droplet_ids = self.droplet_ids()
+
+            droplet_add = [
+                droplet_id for droplet_id in droplet_ids
+                if droplet_id not in current["droplet_ids"]
+            ]
+            droplet_remove = [
+                droplet_id for droplet_id in current["droplet_ids"]
+                if droplet_id not in droplet_ids
+            ]
+
+        rule_add = []
+        rule_remove = []
+
+        if self.module.params["forwarding_rules"] is not None:
+
+            desired = [self.rule(rule) for rule in self.module.params["forwarding_rules"]]
+            existing = [self.rule(rule) for rule in current["forwarding_rules"]]
+
+            rule_add = [
+                rule for rule in self.module.params["forwarding_rules"]
+                if self.rule(rule) not in existing
+            ]
+            rule_remove = [
+                rule for rule in current["forwarding_rules"]
+                if self.rule(rule) not in desired
+            ]
+
+        changes = {}
+
+        if settings:
+
+            attribs = self.spec(current)
+
+            for (field, value) in self.attribs().items():
+                if value is not None:
+                    attribs[field] = value
+
+            if self.module.params["droplet_ids"] is not None:
+                attribs["droplet_ids"] = droplet_ids
+
+            if attribs.get("tag") and self.module.params["droplet_ids"] is None:
+                attribs.pop("droplet_ids", None)
+            else:
+                attribs.pop("tag", None)
+
+            changes["settings"] = settings + [
+                field for (field, differs) in [
+                    ("droplet_ids", droplet_add or droplet_remove),
+                    ("forwarding_rules", rule_add or rule_remove)
+                ]
+                if differs and field not in settings
+            ]
+
+            load_balancer = self.do.load_balancer.update(current["id"], attribs)
+
+            if self.module.params["wait"]:
+                load_balancer = self.active(load_balancer)
+
+            return (changes, load_balancer)
+
+        # Rules replacing ones on the same entry go first so the entry is never taken twice
+
+        entries = [(rule["entry_protocol"], str(rule["entry_port"])) for rule in rule_add]
+
+        replaced = [
+            rule for rule in rule_remove
+            if (rule["entry_protocol"], str(rule["entry_port"])) in entries
+        ]
+
+        steps = [
+            (call, value) for (call, value) in [
+                (self.do.load_balancer.forwarding_rule_remove, replaced),
+                (self.do.load_balancer.forwarding_rule_add, rule_add),
+                (self.do.load_balancer.droplet_add, droplet_add),
+                (self.do.load_balancer.droplet_remove, droplet_remove),
+                (self.do.load_balancer.forwarding_rule_remove, [
+                    rule for rule in rule_remove if rule not in replaced
+                ])
+            ]
+            if value
+        ]
+
+        # The load balancer takes no more changes until it's active again after the last one
+
+        for (index, (call, value)) in enumerate(steps):
+            if index:
+                current = self.active(current)
+            call(current["id"], value)
+
+        for (change, value) in [
+            ("forwarding_rule_add", rule_add),
+            ("droplet_add", droplet_add),
+            ("droplet_remove", droplet_remove),
+            ("forwarding_rule_remove", rule_remove)
+        ]:
+            if value:
+                changes[change] = value
+
+        if steps:
+            if self.module.params["wait"]:
+                current = self.active(current)
+            else:
+                current = self.do.load_balancer.info(current["id"])
+
+        return (changes, current)
+
     @require("id")
-    @require("name")
-    @require("region")
-    @require("forwarding_rules")
     def update(self):
 
-        attribs = self.attribs()
+        (changes, load_balancer) = self.converge(
+            self.do.load_balancer.info(self.module.params["id"])
+        )
 
-        self.module.exit_json(changed=True, load_balancer=self.do.load_balancer.update(
-            self.module.params["id"], attribs
-        ))
+        self.module.exit_json(changed=bool(changes), changes=changes, load_balancer=load_balancer)
 
     @require("id")
     def destroy(self):
@@ -367,6 +617,204 @@ class LoadBalancer(DOBOTOModule):
             self.module.params["id"], self.module.params["forwarding_rules"]
         ))
 
+    def active(self, load_balancer):
+        """
+        Polls the load balancer until it's active again after a change, whether or not wait is set,
+        as it takes no other changes until then
+        """
+
+        # Changes put load balancers back to new until they're applied
+
+        return Poller(
+            self.module.params["poll"], self.module.params["timeout"],
+            POLL_HINTS["load_balancer_update"], self.metrics
+        ).wait(
+            dict(load_balancer, status="new"),
+            lambda load_balancer: self.do.load_balancer.info(load_balancer["id"]),
+            lambda load_balancer: load_balancer["status"] == "active"
+        )
+
+    @require("id")
+    @require("droplet_ids", "tag_name")
+    def droplets_sync(self):
+        """
+        Adds and removes droplets, a chunk at a time, until the load balancer has just those
+        given, adding before removing and waiting for it to be active after each chunk, and
+        returns only what changed
+        """
+
+        load_balancer = self.do.load_balancer.info(self.module.params["id"])
+
+        # Tagged load balancers take whatever droplets have the tag, and refuse any others
+
+        if load_balancer.get("tag"):
+            self.module.fail_json(msg=(
+                "load balancer %s sends traffic to droplets tagged %s, so droplets_sync can't "
+                "manage its droplets; tag them instead, or switch it to droplets with cutover"
+            ) % (load_balancer["id"], load_balancer["tag"]))
+
+        droplet_ids = self.droplet_ids()
+
+        if self.module.params["tag_name"] is not None:
+            droplet_ids.extend(droplet["id"] for droplet in self.pages(
+                self.do.droplet, "droplets", {"tag_name": self.module.params["tag_name"]}
+            ))
+
+        added = [
+            droplet_id for (index, droplet_id) in enumerate(droplet_ids)
+            if droplet_id not in load_balancer["droplet_ids"] and
+            droplet_id not in droplet_ids[:index]
+        ]
+        removed = [
+            droplet_id for droplet_id in load_balancer["droplet_ids"]
+            if droplet_id not in droplet_ids
+        ]
+
+        chunks = {}
+        done = {"added": [], "removed": []}
+
+        for (change, call, changing) in [
+            ("added", self.do.load_balancer.droplet_add, added),
+            ("removed", self.do.load_balancer.droplet_remove, removed)
+        ]:
+
+            if not changing:
+                continue
+
+            def send(chunk):
+                call(self.module.params["id"], chunk)
+                self.active(load_balancer)
+
+            (chunks[change], unsent) = self.chunks(
+                send, changing, self.module.params["chunk_size"], 1
+            )
+
+            done[change] = [droplet_id for droplet_id in changing if droplet_id not in unsent]
+
+            if unsent:
+                self.module.fail_json(
+                    msg="%s droplets couldn't be %s" % (len(unsent), change),
+                    changed=bool(done["added"] or done["removed"]), unsent=unsent,
+                    chunks=chunks, **done
+                )
+
+        self.module.exit_json(
+            changed=bool(added or removed), chunks=chunks,
+            count=len(set(droplet_ids)), **done
+        )
+
+    def settle(self, load_balancer, expected=None):
+        """
+        Polls the load balancer until it's active again, expecting it to take about as long as
+        last time, and returns it with how many seconds that took
+        """
+
+        start = time.time()
+
+        load_balancer = Poller(
+            self.module.params["poll"], self.module.params["timeout"],
+            expected or POLL_HINTS["load_balancer_cutover"], self.metrics
+        ).wait(
+            dict(load_balancer, status="new"),
+            lambda load_balancer: self.do.load_balancer.info(load_balancer["id"]),
+            lambda load_balancer: load_balancer["status"] == "active"
+        )
+
+        return (load_balancer, round(time.time() - start, 3))
+
+    @require("id")
+    @require("tag", "droplet_ids", "tag_name")
+    def cutover(self):
+        """
+        Switches the load balancer over to the tag or droplets given in as few calls as possible,
+        a single put when a tag's involved, otherwise adding the new droplets, then removing the
+        rest once it's active again, and reports how long the switch took
+        """
+
+        load_balancer = self.do.load_balancer.info(self.module.params["id"])
+
+        droplet_ids = self.droplet_ids()
+
+        if self.module.params["tag_name"] is not None:
+            droplet_ids.extend(droplet["id"] for droplet in self.pages(
+                self.do.droplet, "droplets", {"tag_name": self.module.params["tag_name"]}
+            ))
+
+        droplet_ids = [
+            droplet_id for (index, droplet_id) in enumerate(droplet_ids)
+            if droplet_id not in droplet_ids[:index]
+        ]
+
+        if self.module.params["tag"] is None and not droplet_ids:
+            self.module.fail_json(msg="no droplets to cut over to")
+
+        phases = []
+        start = time.time()
+
+        if self.module.params["tag"] is not None or load_balancer.get("tag"):
+
+            # Moving to or from a tag means putting the whole load balancer, which does it at once
+
+            attribs = self.spec(load_balancer)
+
+            if self.module.params["tag"] is not None:
+                attribs["tag"] = self.module.params["tag"]
+                attribs.pop("droplet_ids", None)
+            else:
+                attribs["droplet_ids"] = droplet_ids
+                attribs.pop("tag", None)
+
+            if self.module.params["tag"] == load_balancer.get("tag"):
+                self.module.exit_json(changed=False, added=[], removed=[], window=0, phases=phases)
+
+            before = load_balancer["droplet_ids"]
+
+            load_balancer = self.do.load_balancer.update(self.module.params["id"], attribs)
+
+            (load_balancer, seconds) = self.settle(load_balancer)
+            phases.append({"change": "update", "seconds": seconds})
+
+            self.module.exit_json(
+                changed=True, window=round(time.time() - start, 3), phases=phases,
+                added=[
+                    droplet_id for droplet_id in load_balancer["droplet_ids"]
+                    if droplet_id not in before
+                ],
+                removed=[
+                    droplet_id for droplet_id in before
+                    if droplet_id not in load_balancer["droplet_ids"]
+                ]
+            )
+
+        added = [
+            droplet_id for droplet_id in droplet_ids
+            if droplet_id not in load_balancer["droplet_ids"]
+        ]
+        removed = [
+            droplet_id for droplet_id in load_balancer["droplet_ids"]
+            if droplet_id not in droplet_ids
+        ]
+
+        expected = None
+
+        for (change, call, changing) in [
+            ("droplet_add", self.do.load_balancer.droplet_add, added),
+            ("droplet_remove", self.do.load_balancer.droplet_remove, removed)
+        ]:
+
+            if not changing:
+                continue
+
+            call(self.module.params["id"], changing)
+
+            (load_balancer, expected) = self.settle(load_balancer, expected)
+            phases.append({"change": change, "droplets": len(changing), "seconds": expected})
+
+        self.module.exit_json(
+            changed=bool(phases), added=added, removed=removed,
+            window=round(time.time() - start, 3) if phases else 0, phases=phases
+        )
+
 
 if __name__ == '__main__':
     LoadBalancer()
@@ -40,6 +40,22 @@ options:
             - list
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
+    cache:
+        description: use, refresh or bypass (default) the on disk result cache
+        choices:
+            - use
+            - refresh
+            - bypass
+    cache_dir:
+        description: directory for the result cache (uses DOBOTO_CACHE_DIR from ENV or ~/.doboto/cache)
+    cache_ttl:
+        description: seconds a cached result stays fresh (defaults per resource type)
+    cache_size:
+        description: maximum bytes of the result cache before least recently used results are evicted
 '''
 
 EXAMPLES = '''
@@ -47,6 +63,12 @@ EXAMPLES = '''
   doboto_size:
     action: list
   register: size_list
+
+- name: size | list | cache
+  doboto_size:
+    action: list
+    cache: use
+  register: size_list_cache
 '''
 
 
@@ -59,11 +81,17 @@ class Size(DOBOTOModule):
                 "list"
             ]),
             token=dict(default=None, no_log=True),
-            url=dict(default=self.url)
+            url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
+            cache=dict(default="bypass", choices=["use", "refresh", "bypass"]),
+            cache_dir=dict(default=None),
+            cache_ttl=dict(default=None, type='int'),
+            cache_size=dict(default=None, type='int'),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, sizes=self.do.size.list())
+        self.module.exit_json(changed=False, sizes=self.cached("sizes", self.do.size.list))
 
 
 if __name__ == '__main__':
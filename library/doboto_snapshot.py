@@ -46,6 +46,18 @@ options:
         description: same as DO API variable
     url:
         description: URL to use if not official (for experimenting)
+    limit:
+        description: most results to return from list, only fetching the pages needed
+    page:
+        description: only return this page of results from list
+    per_page:
+        description: results per page when listing (default 200, or limit if lower)
+    stop:
+        description: JMESPath expression, list stops before the first result it's true for (requires jmespath)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 
 '''
 
@@ -128,12 +140,18 @@ class Snapshot(DOBOTOModule):
             token=dict(default=None, no_log=True),
             id=dict(default=None),
             resource_type=dict(default=None),
-            url=dict(default=self.url)
+            url=dict(default=self.url),
+            limit=dict(default=None, type='int'),
+            page=dict(default=None, type='int'),
+            per_page=dict(default=None, type='int'),
+            stop=dict(default=None),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None)
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, snapshots=self.do.snapshot.list(
-            resource_type=self.module.params["resource_type"]
+        self.module.exit_json(changed=False, snapshots=self.paginate(
+            self.do.snapshot, "snapshots", {"resource_type": self.module.params["resource_type"]}
         ))
 
     @require("id")
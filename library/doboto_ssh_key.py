@@ -53,6 +53,10 @@ options:
         description: same as DO API variable
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -124,6 +128,8 @@ class SSHKey(DOBOTOModule):
             public_key=dict(default=None),
             name=dict(default=None),
             url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
         ))
 
     def list(self):
@@ -1,9 +1,13 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import copy
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.doboto_module import require, DOBOTOModule
+from ansible.module_utils.doboto_module import require, DOBOTOModule, BATCH_CONCURRENCY, CHUNK_SIZE
+
+try:
+    from doboto.exception import DOBOTONotFoundException
+except ImportError:
+    pass
 
 """
 Ansible module to manage DigitalOcean tags
@@ -47,8 +51,23 @@ options:
             - destroy
             - attach
             - detach
+            - resources
     name:
         description: same as DO API variable
+    names:
+        description: tags to find resources for with the resources action, paired with match
+    match:
+        description: with several tags, whether resources need any of them or all of them (default any)
+        choices:
+            - any
+            - all
+    resource_types:
+        description: resource types to find with the resources action (default all of them)
+        choices:
+            - droplet
+            - image
+            - volume
+            - volume_snapshot
     new_name:
         description: same as DO API variable, new name for updating
     resources:
@@ -59,8 +78,24 @@ options:
         description: same as DO API variable, use if doing a single resource id
     resource_ids:
         description: paired with a single resource_type to build a resources list
+    chunk_size:
+        description: most resources to attach or detach per request (default 100)
+    concurrency:
+        description: most requests to make at once when attaching, detaching or finding resources (default 4)
     url:
         description: URL to use if not official (for experimenting)
+    limit:
+        description: most results to return from list, only fetching the pages needed
+    page:
+        description: only return this page of results from list
+    per_page:
+        description: results per page when listing (default 200, or limit if lower)
+    stop:
+        description: JMESPath expression, list stops before the first result it's true for (requires jmespath)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 '''
 
 EXAMPLES = '''
@@ -157,6 +192,29 @@ EXAMPLES = '''
   vars:
     tag_droplet_ids_query: "droplets[].id"
 
+- name: tag | attach | many | droplet
+  doboto_tag:
+    action: attach
+    name: tag-many
+    resource_type: droplet
+    resource_ids: "{{ droplet_ids }}"
+    chunk_size: 50
+    concurrency: 8
+  register: tag_attach_many
+
+- name: tag | resources | all
+  doboto_tag:
+    action: resources
+    names:
+      - prod
+      - web
+    match: all
+  register: tag_resources
+
+- name: tag | resources | all | ids
+  debug:
+    msg: "{{ tag_resources.resources.droplet|map(attribute='id')|list }}"
+
 - name: tag | detach | droplet
   doboto_tag:
     action: detach
@@ -172,6 +230,18 @@ EXAMPLES = '''
   register: tag_destroy
 '''
 
+# Resource type to DOBOTO endpoint, the key the API returns them under, what to list them with,
+# tagged images only ever being private ones, and their key in a tag's resources
+
+TAGGABLE = {
+    "droplet": ("droplet", "droplets", {}, "droplets"),
+    "image": ("image", "images", {"private": "true"}, "images"),
+    "volume": ("volume", "volumes", {}, "volumes"),
+    "volume_snapshot": ("snapshot", "snapshots", {"resource_type": "volume"}, "volume_snapshots")
+}
+
+TAGGABLE_ORDER = ["droplet", "image", "volume", "volume_snapshot"]
+
 
 class Tag(DOBOTOModule):
 
@@ -188,19 +258,31 @@ class Tag(DOBOTOModule):
                 "destroy",
                 "attach",
                 "detach",
+                "resources",
             ]),
             token=dict(default=None, no_log=True),
             name=dict(default=None),
+            names=dict(default=None, type='list'),
+            match=dict(default="any", choices=["any", "all"]),
+            resource_types=dict(default=TAGGABLE_ORDER, type='list'),
             new_name=dict(default=None),
             resources=dict(default=None, type='list'),
             resource_type=dict(default=None),
             resource_id=dict(default=None),
             resource_ids=dict(default=None, type='list'),
+            chunk_size=dict(default=CHUNK_SIZE, type='int'),
+            concurrency=dict(default=BATCH_CONCURRENCY, type='int'),
             url=dict(default=self.url),
+            limit=dict(default=None, type='int'),
+            page=dict(default=None, type='int'),
+            per_page=dict(default=None, type='int'),
+            stop=dict(default=None),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None),
         ))
 
     def list(self):
-        self.module.exit_json(changed=False, tags=self.do.tag.list())
+        self.module.exit_json(changed=False, tags=self.paginate(self.do.tag, "tags"))
 
     def name_list(self):
         self.module.exit_json(changed=False, names=self.do.tag.name_list())
@@ -226,31 +308,44 @@ class Tag(DOBOTOModule):
         ))
 
     def build(self):
+        """
+        Returns the resources from all the parameters, each once
+        """
 
-        resources = []
+        pairs = []
 
         if self.module.params["resource_type"] is not None and \
            self.module.params["resource_id"] is not None:
-            resources.append({
-                "resource_type": self.module.params["resource_type"],
-                "resource_id": self.module.params["resource_id"]
-            })
+            pairs.append((self.module.params["resource_type"], self.module.params["resource_id"]))
 
         if self.module.params["resource_type"] is not None and \
            self.module.params["resource_ids"] is not None:
-            for resource_id in self.module.params["resource_ids"]:
-                resources.append({
-                    "resource_type": self.module.params["resource_type"],
-                    "resource_id": resource_id
-                })
+            pairs.extend(
+                (self.module.params["resource_type"], resource_id)
+                for resource_id in self.module.params["resource_ids"]
+            )
 
         if self.module.params["resources"] is not None:
-            resources.extend(copy.deepcopy(self.module.params["resources"]))
+            pairs.extend(
+                (resource["resource_type"], resource["resource_id"])
+                for resource in self.module.params["resources"]
+            )
+
+        resources = []
+        seen = set()
+
+        for (resource_type, resource_id) in pairs:
+            if (resource_type, str(resource_id)) not in seen:
+                seen.add((resource_type, str(resource_id)))
+                resources.append({"resource_type": resource_type, "resource_id": str(resource_id)})
 
         return resources
 
-    @require("name")
-    def attach(self):
+    def chunked(self, call):
+        """
+        Sends the resources in chunks, failing with those that couldn't be sent, and returning
+        what the API answered as result like a single call would
+        """
 
         resources = self.build()
 
@@ -259,23 +354,186 @@ class Tag(DOBOTOModule):
                 msg="the resources or resource_type and resource_id(s) parameters are required"
             )
 
-        self.module.exit_json(changed=True, result=self.do.tag.attach(
-            self.module.params["name"], resources
-        ))
+        results = []
 
-    @require("name")
-    def detach(self):
+        (report, unsent) = self.chunks(
+            lambda chunk: results.append(call(self.module.params["name"], chunk)), resources,
+            self.module.params["chunk_size"], self.module.params["concurrency"]
+        )
 
-        resources = self.build()
+        result = results[0] if results else None
 
-        if not resources:
+        errored = len([chunk for chunk in report if chunk["error"] is not None])
+
+        if errored:
             self.module.fail_json(
-                msg="the resources or resource_type and resource_id(s) parameters are required"
+                msg="%s of %s chunks failed" % (errored, len(report)),
+                changed=errored < len(report), result=result, chunks=report, unsent=unsent
             )
 
-        self.module.exit_json(changed=True, result=self.do.tag.detach(
-            self.module.params["name"], resources
-        ))
+        self.module.exit_json(changed=True, result=result, chunks=report)
+
+    @require("name")
+    def attach(self):
+        self.chunked(self.do.tag.attach)
+
+    @require("name")
+    def detach(self):
+        self.chunked(self.do.tag.detach)
+
+    def tagged(self, name):
+        """
+        Returns the resources summary of a tag, counts and last tagged by type, empty if missing
+        """
+
+        try:
+            return self.do.tag.info(name).get("resources") or {}
+        except DOBOTONotFoundException:
+            return {}
+
+    def fetch(self, job):
+        """
+        Gets one resource by id, or every page of one resource type, droplets being filtered by
+        tag by the API
+        """
+
+        (resource_type, resource_id, tag) = job
+        (endpoint, key, params, summary) = TAGGABLE[resource_type]
+
+        if resource_id is not None:
+            try:
+                return (resource_type, [getattr(self.do, endpoint).info(resource_id)])
+            except DOBOTONotFoundException:
+                return (resource_type, [])
+
+        if tag is not None:
+            params = dict(params, tag_name=tag)
+
+        return (resource_type, list(self.pages(getattr(self.do, endpoint), key, params)))
+
+    def jobs(self, resource_type, summaries):
+        """
+        Works out what to fetch for a resource type from the tags' summaries, skipping it when
+        none are tagged, fetching by id when a tag's last tagged is its only one, and only listing
+        otherwise, for just the rarest tag if resources need all of them
+        """
+
+        counted = []
+
+        for (name, summary) in summaries:
+            tagged = summary.get(TAGGABLE[resource_type][3]) or {}
+            if tagged.get("count"):
+                counted.append((name, tagged))
+
+        if self.module.params["match"] == "all":
+            if len(counted) < len(summaries):
+                return []
+            counted = [min(counted, key=lambda pair: pair[1]["count"])]
+
+        jobs = []
+
+        for (name, tagged) in counted:
+
+            uri = tagged.get("last_tagged_uri") or ""
+            resource_id = uri.rstrip("/").rsplit("/", 1)[-1] or None
+
+            if resource_id is None and tagged.get("last_tagged"):
+                resource_id = str(tagged["last_tagged"]["id"])
+
+            if tagged["count"] == 1 and resource_id is not None:
+                job = (resource_type, resource_id, None)
+            elif resource_type == "droplet":
+                job = (resource_type, None, name)
+            else:
+                job = (resource_type, None, None)
+
+            if job not in jobs:
+                jobs.append(job)
+
+        # Listing a whole type finds whatever fetching single ones of it would
+
+        if (resource_type, None, None) in jobs:
+            jobs = [(resource_type, None, None)]
+
+        return jobs
+
+    @require("name", "names")
+    def resources(self):
+        """
+        Finds everything with any or all of the tags from what the tags' own summaries say is
+        tagged, fetching it all at once and indexing it by tag a single time
+        """
+
+        names = list(self.module.params["names"] or [])
+
+        if self.module.params["name"] is not None:
+            names.insert(0, self.module.params["name"])
+
+        names = [name for (index, name) in enumerate(names) if name not in names[:index]]
+
+        if not names:
+            self.module.fail_json(msg="the name or names parameter is required")
+
+        resource_types = self.module.params["resource_types"]
+
+        unknown = [
+            resource_type for resource_type in resource_types if resource_type not in TAGGABLE
+        ]
+
+        if unknown:
+            self.module.fail_json(msg="unknown resource_types: %s" % ", ".join(unknown))
+
+        summaries = list(zip(names, self.map(self.tagged, names, self.module.params["concurrency"])))
+
+        jobs = []
+
+        for resource_type in TAGGABLE_ORDER:
+            if resource_type in resource_types:
+                jobs.extend(self.jobs(resource_type, summaries))
+
+        # Index every resource found by the tags asked about that it has, each resource once
+
+        found = {}
+        index = dict((name, set()) for name in names)
+        ordered = []
+
+        listings = self.map(self.fetch, jobs, self.module.params["concurrency"])
+
+        for (resource_type, listed) in listings:
+            for resource in listed:
+
+                key = (resource_type, str(resource["id"]))
+
+                tagged = [name for name in resource.get("tags") or [] if name in index]
+
+                if not tagged:
+                    continue
+
+                if key not in found:
+                    found[key] = resource
+                    ordered.append(key)
+
+                for name in tagged:
+                    index[name].add(key)
+
+        if self.module.params["match"] == "all":
+            keys = set.intersection(*index.values())
+        else:
+            keys = set.union(*index.values())
+
+        resources = dict(
+            (resource_type, []) for resource_type in TAGGABLE_ORDER
+            if resource_type in resource_types
+        )
+
+        for key in ordered:
+            if key in keys:
+                resources[key[0]].append(found[key])
+
+        self.module.exit_json(
+            changed=False, resources=resources, count=len(keys),
+            tags=dict((name, len(keys & index[name])) for name in names)
+        )
 
     @require("name")
     def destroy(self):
@@ -69,13 +69,17 @@ options:
     wait:
         description: wait until tasks has completed before continuing
     poll:
-        description: poll value to check while waiting (default 5 seconds)
+        description: longest interval between checks while waiting, which backs off up to it (default 5 seconds)
     timeout:
         description: timeout value to give up after waiting (default 300 seconds)
     action_id:
         description: same as DO API variable (action id)
     url:
         description: URL to use if not official (for experimenting)
+    fields:
+        description: only return these fields from list and info actions, with dots for nested fields (image.slug)
+    query:
+        description: JMESPath expression applied to the result of list and info actions (requires jmespath)
 
 '''
 
@@ -233,7 +237,9 @@ class Volume(DOBOTOModule):
             poll=dict(default=5, type='int'),
             timeout=dict(default=300, type='int'),
             action_id=dict(default=None),
-            url=dict(default=self.url)
+            url=dict(default=self.url),
+            fields=dict(default=None, type='list'),
+            query=dict(default=None)
         ))
 
     def list(self):
@@ -261,12 +267,20 @@ class Volume(DOBOTOModule):
 
         attribs = self.attribs()
 
-        self.module.exit_json(changed=True, volume=self.do.volume.create(
-            attribs,
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+        self.module.exit_json(changed=True, volume=self.wait_volume(self.do.volume.create(attribs)))
+
+    def wait_volume(self, volume):
+
+        # Like doboto, waits until the new volume can be retrieved
+
+        found = self.wait(
+            None,
+            lambda found: self.do.volume.info(id=volume["id"]),
+            lambda found: found is not None,
+            "volume_create"
+        )
+
+        return volume if found is None else found
 
     @require("name")
     @require("size_gigabytes")
@@ -275,12 +289,11 @@ class Volume(DOBOTOModule):
 
         attribs = self.attribs()
 
-        (volume, created) = self.do.volume.present(
-            attribs,
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        )
+        (volume, created) = self.do.volume.present(attribs)
+
+        if created is not None:
+            volume = created = self.wait_volume(created)
+
         self.module.exit_json(changed=(created is not None), volume=volume, created=created)
 
     def info(self):
@@ -337,40 +350,31 @@ class Volume(DOBOTOModule):
     @require("id", "name")
     @require("droplet_id")
     def attach(self):
-        self.module.exit_json(changed=True, action=self.do.volume.attach(
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.volume.attach(
             id=self.module.params["id"],
             name=self.module.params["name"],
             droplet_id=self.module.params["droplet_id"],
-            region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            region=self.module.params["region"]
+        )))
 
     @require("id", "name")
     @require("droplet_id")
     def detach(self):
-        self.module.exit_json(changed=True, action=self.do.volume.detach(
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.volume.detach(
             id=self.module.params["id"],
             name=self.module.params["name"],
             droplet_id=self.module.params["droplet_id"],
-            region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            region=self.module.params["region"]
+        )))
 
     @require("id", "name")
     @require("size_gigabytes")
     def resize(self):
-        self.module.exit_json(changed=True, action=self.do.volume.resize(
+        self.module.exit_json(changed=True, action=self.wait_action(self.do.volume.resize(
             self.module.params["id"],
             self.module.params["size_gigabytes"],
-            region=self.module.params["region"],
-            wait=self.module.params["wait"],
-            poll=self.module.params["poll"],
-            timeout=self.module.params["timeout"]
-        ))
+            region=self.module.params["region"]
+        )))
 
     @require("id")
     def action_list(self):
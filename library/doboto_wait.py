@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.doboto_module import require, DOBOTOModule, Poller, POLL_HINTS, PAGE_SIZE
+
+"""
+Ansible module to wait on DigitalOcean actions
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+DOCUMENTATION = '''
+---
+module: doboto_wait
+
+short_description: Wait on DigitalOcean Actions
+description: Waits on many DigitalOcean actions at once, polling them together
+version_added: "0.6"
+author: "SWE Data <swe-data@do.co>"
+options:
+    token:
+        description: token to use to connect to the API (uses DO_API_TOKEN from ENV if not found)
+    action:
+        description: wait action
+        choices:
+            - wait
+    action_ids:
+        description: ids of actions to wait on, like the action_ids returned by action-producing modules
+    resource_ids:
+        description: ids of resources to wait on all in-progress actions of, paired with resource_type
+    resource_type:
+        description: type of the resources in resource_ids, required with them
+        choices:
+            - droplet
+            - volume
+            - image
+            - floating_ip
+    poll:
+        description: longest interval between checks while waiting, which backs off up to it (default 5 seconds)
+    timeout:
+        description: seconds to wait before failing (default 300)
+    url:
+        description: URL to use if not official (for experimenting)
+'''
+
+EXAMPLES = '''
+- name: wait | droplet | power_off
+  doboto_droplet:
+    action: power_off
+    id: "{{ item }}"
+  with_items: "{{ droplet_ids }}"
+  register: droplet_power_off
+
+- name: wait | action_ids
+  doboto_wait:
+    action_ids: "{{ droplet_power_off.results | map(attribute='action_ids') | flatten }}"
+  register: wait_action_ids
+
+- name: wait | resource_ids
+  doboto_wait:
+    resource_ids: "{{ droplet_ids }}"
+    resource_type: droplet
+  register: wait_resource_ids
+'''
+
+
+class Wait(DOBOTOModule):
+
+    def input(self):
+        return AnsibleModule(argument_spec=dict(
+            action=dict(default="wait", choices=[
+                "wait"
+            ]),
+            token=dict(default=None, no_log=True),
+            action_ids=dict(default=None, type='list'),
+            resource_ids=dict(default=None, type='list'),
+            resource_type=dict(default=None, choices=["droplet", "volume", "image", "floating_ip"]),
+            poll=dict(default=5, type='int'),
+            timeout=dict(default=300, type='int'),
+            url=dict(default=self.url),
+        ))
+
+    def in_progress(self, resource_id):
+        """
+        Finds the in-progress actions of a resource from its own actions, newest first, stopping
+        at the first full page without any
+        """
+
+        endpoint = getattr(self.do, self.module.params["resource_type"])
+        uri = "%s/%s/actions" % (endpoint.uri, resource_id)
+
+        actions = []
+        settled = 0
+
+        for action in self.pages(endpoint, "actions", uri=uri):
+
+            if action["status"] != "in-progress":
+                settled += 1
+                if settled >= PAGE_SIZE:
+                    break
+                continue
+
+            settled = 0
+            actions.append(action)
+
+        return actions
+
+    def resource_actions(self, resource_ids):
+        """
+        Finds the in-progress actions of all the resources concurrently
+        """
+
+        resource_ids = [str(resource_id) for resource_id in resource_ids]
+
+        return [
+            action for actions in self.map(self.in_progress, resource_ids) for action in actions
+        ]
+
+    @require("action_ids", "resource_ids")
+    def wait(self):
+
+        if self.module.params["resource_ids"] and self.module.params["resource_type"] is None:
+            self.module.fail_json(msg="the resource_type parameter is required with resource_ids")
+
+        actions = []
+
+        if self.module.params["action_ids"]:
+
+            actions.extend(self.refresh_actions([
+                {"id": int(action_id), "status": "in-progress"}
+                for action_id in self.module.params["action_ids"]
+            ]))
+
+            # What neither the listing nor asking for it by id turned up doesn't exist
+
+            missing = [action["id"] for action in actions if "type" not in action]
+
+            if missing:
+                self.module.fail_json(
+                    msg="%s of %s actions not found" % (len(missing), len(actions)),
+                    missing=missing
+                )
+
+        if self.module.params["resource_ids"]:
+            known = set(action["id"] for action in actions)
+            actions.extend(
+                action for action in self.resource_actions(self.module.params["resource_ids"])
+                if action["id"] not in known
+            )
+
+        if actions:
+            actions = Poller(
+                self.module.params["poll"], self.module.params["timeout"],
+                POLL_HINTS.get(actions[0].get("type")), self.metrics
+            ).wait(
+                actions,
+                self.refresh_actions,
+                lambda actions: all(action["status"] != "in-progress" for action in actions)
+            )
+
+        errored = [action for action in actions if action["status"] == "errored"]
+
+        result = dict(
+            changed=False,
+            actions=actions,
+            completed=len([action for action in actions if action["status"] == "completed"]),
+            errored=len(errored)
+        )
+
+        if errored:
+            self.module.fail_json(
+                msg="%s of %s actions errored" % (len(errored), len(actions)), **result
+            )
+
+        self.module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    Wait()
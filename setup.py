@@ -7,7 +7,8 @@ setup(
     name='doboto-ansible',
     version="0.6.0",
     description="DOBOTO Ansible Modules",
-    packages=['ansible.module_utils'],
+    packages=['ansible.module_utils', 'ansible.plugins.action', 'ansible.plugins.inventory',
+              'ansible.plugins.lookup'],
     long_description="BOTO-like Ansible modules for interacting with the Digital Ocean API",
     author="Digital Ocean Data Team",
     author_email="swe-data@do.co",
@@ -27,11 +28,13 @@ setup(
         "library/doboto_droplet.py",
         "library/doboto_floating_ip.py",
         "library/doboto_image.py",
+        "library/doboto_inventory.py",
         "library/doboto_load_balancer.py",
         "library/doboto_region.py",
         "library/doboto_size.py",
         "library/doboto_snapshot.py",
         "library/doboto_ssh_key.py",
         "library/doboto_tag.py",
+        "library/doboto_wait.py",
     ])]
 )
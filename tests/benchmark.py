@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline benchmark for the DOBOTO modules
+(c) 2017, SWE Data <swe-data@do.co>
+
+Starts the local API stand-in, runs a playbook against it and reports how long each task took
+and how many API requests it made.
+
+    python tests/benchmark.py
+    python tests/benchmark.py --playbook tests/benchmark.yml --action-delay 1 --create-delay 2
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, HERE)
+
+from mock_api import API, Server
+
+
+def tasks(path):
+    """
+    Yields the timing the benchmark callback recorded for each task
+    """
+
+    with open(path) as timings:
+        for line in timings:
+            yield json.loads(line)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark DOBOTO modules offline")
+    parser.add_argument("--playbook", default=os.path.join(HERE, "benchmark.yml"))
+    parser.add_argument("--port", default=0, type=int)
+    parser.add_argument("--action-delay", default=2.0, type=float)
+    parser.add_argument("--create-delay", default=3.0, type=float)
+    parser.add_argument("--rate-limit", default=5000, type=int)
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    parser.add_argument("--verbose", action="store_true", help="show the playbook output")
+    args, extra = parser.parse_known_args()
+
+    api = API(args.action_delay, args.create_delay, args.rate_limit)
+    server = Server(("127.0.0.1", args.port), api)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    url = "http://127.0.0.1:%s/v2" % server.server_address[1]
+
+    env = dict(os.environ)
+    env.setdefault("DO_API_TOKEN", "benchmark")
+    env.setdefault("ANSIBLE_LIBRARY", os.path.join(os.path.dirname(HERE), "library"))
+    env.setdefault("DOBOTO_RATE_LIMIT_DIR", tempfile.mkdtemp(prefix="doboto-benchmark-"))
+    env["DOBOTO_BENCHMARK"] = tempfile.mkstemp(prefix="doboto-benchmark-", suffix=".json")[1]
+    env["ANSIBLE_CALLBACK_PLUGINS"] = os.path.join(HERE, "callback_plugins")
+    env["ANSIBLE_CALLBACKS_ENABLED"] = "doboto_benchmark"
+    env["ANSIBLE_CALLBACK_WHITELIST"] = "doboto_benchmark"
+
+    with open(os.devnull, "w") as quiet:
+        code = subprocess.call(
+            ["ansible-playbook", "-i", "localhost,", "-e", "doboto_url=%s" % url,
+             args.playbook] + extra,
+            stdout=None if args.verbose else quiet, env=env
+        )
+
+    server.shutdown()
+
+    report = []
+
+    for task in tasks(env["DOBOTO_BENCHMARK"]):
+        calls = [call for call in api.log if task["start"] <= call["time"] <= task["end"]]
+        report.append({
+            "task": task["task"],
+            "seconds": round(task["end"] - task["start"], 3),
+            "requests": len(calls),
+            "endpoints": sorted(set("%s %s" % (call["method"], call["path"]) for call in calls)),
+            "failed": task["failed"]
+        })
+
+    os.remove(env["DOBOTO_BENCHMARK"])
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        width = max([len(row["task"]) for row in report] + [4])
+        print("%-*s %9s %9s" % (width, "task", "seconds", "requests"))
+        for row in report:
+            print("%-*s %9.3f %9d%s" % (
+                width, row["task"], row["seconds"], row["requests"],
+                "  FAILED" if row["failed"] else ""
+            ))
+        print("%-*s %9.3f %9d" % (
+            width, "total", sum(row["seconds"] for row in report), len(api.log)
+        ))
+
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+from ansible.plugins.callback import CallbackBase
+
+"""
+Ansible callback plugin recording task timings for the DOBOTO benchmark
+(c) 2017, SWE Data <swe-data@do.co>
+
+This file is part of Ansible
+
+Ansible is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Ansible is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+class CallbackModule(CallbackBase):
+    """
+    Writes a line of json per task, with its name, start, end and whether it failed, to the
+    file named by DOBOTO_BENCHMARK
+    """
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'doboto_benchmark'
+    CALLBACK_NEEDS_WHITELIST = True
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.path = os.environ.get("DOBOTO_BENCHMARK")
+        self.task = None
+
+    def finish(self):
+
+        if self.task is None or self.path is None:
+            return
+
+        self.task["end"] = time.time()
+
+        with open(self.path, "a") as timings:
+            timings.write(json.dumps(self.task) + "\n")
+
+        self.task = None
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.finish()
+        self.task = {"task": task.get_name(), "start": time.time(), "failed": False}
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        if self.task is not None:
+            self.task["failed"] = True
+
+    def v2_playbook_on_stats(self, stats):
+        self.finish()
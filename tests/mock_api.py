@@ -0,0 +1,1372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in for the DigitalOcean v2 API used by the DOBOTO modules
+(c) 2017, SWE Data <swe-data@do.co>
+
+Holds everything in memory, pages lists like the real API, moves actions, droplets and load
+balancers from in-progress to done after configurable delays, and sends rate limit headers and
+ETags, answering a matching If-None-Match with 304.
+Point modules at it through their url parameter, e.g. url: http://127.0.0.1:8080/v2
+
+GET /_stats returns every request made so far, DELETE /_stats clears them.
+
+    python tests/mock_api.py --port 8080 --action-delay 2 --create-delay 3
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import itertools
+import collections
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+    from urllib import urlencode
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs, urlencode
+
+PER_PAGE = 20
+PER_PAGE_MAX = 200
+
+REGIONS = [
+    {"slug": "nyc1", "name": "New York 1"},
+    {"slug": "nyc2", "name": "New York 2"},
+    {"slug": "nyc3", "name": "New York 3"},
+    {"slug": "sfo2", "name": "San Francisco 2"},
+    {"slug": "ams3", "name": "Amsterdam 3"},
+]
+
+SIZES = [
+    {"slug": "512mb", "memory": 512, "vcpus": 1, "disk": 20, "transfer": 1.0, "price_monthly": 5.0},
+    {"slug": "1gb", "memory": 1024, "vcpus": 1, "disk": 30, "transfer": 2.0, "price_monthly": 10.0},
+    {"slug": "2gb", "memory": 2048, "vcpus": 2, "disk": 40, "transfer": 3.0, "price_monthly": 20.0},
+    {"slug": "4gb", "memory": 4096, "vcpus": 2, "disk": 60, "transfer": 4.0, "price_monthly": 40.0},
+]
+
+DISTRIBUTIONS = [
+    ("debian-7-0-x64", "Debian", "7.11 x64"),
+    ("debian-8-x64", "Debian", "8.7 x64"),
+    ("ubuntu-14-04-x64", "Ubuntu", "14.04.5 x64"),
+    ("ubuntu-16-04-x64", "Ubuntu", "16.04.2 x64"),
+    ("centos-7-x64", "CentOS", "7.3.1611 x64"),
+]
+
+NOT_FOUND = {"id": "not_found", "message": "The resource you were accessing could not be found."}
+
+
+class NotFound(Exception):
+    pass
+
+
+class Invalid(Exception):
+    pass
+
+
+class API(object):
+    """
+    In memory account state plus the handlers for each endpoint
+    """
+
+    def __init__(self, action_delay=2.0, create_delay=3.0, rate_limit=5000, window=3600):
+
+        self.action_delay = action_delay
+        self.create_delay = create_delay
+        self.rate_limit = rate_limit
+        self.window = window
+
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1000)
+        self.pending = []
+        self.calls = collections.deque()
+        self.log = []
+
+        self.droplets = collections.OrderedDict()
+        self.actions = collections.OrderedDict()
+        self.volumes = collections.OrderedDict()
+        self.images = collections.OrderedDict()
+        self.snapshots = collections.OrderedDict()
+        self.domains = collections.OrderedDict()
+        self.records = {}
+        self.tags = collections.OrderedDict()
+        self.load_balancers = collections.OrderedDict()
+        self.certificates = collections.OrderedDict()
+        self.floating_ips = collections.OrderedDict()
+        self.ssh_keys = collections.OrderedDict()
+
+        for (slug, distribution, name) in DISTRIBUTIONS:
+            image_id = next(self.ids)
+            self.images[image_id] = {
+                "id": image_id, "name": name, "distribution": distribution, "slug": slug,
+                "public": True, "regions": [region["slug"] for region in REGIONS],
+                "type": "snapshot", "min_disk_size": 20, "size_gigabytes": 2.1,
+                "created_at": self.now()
+            }
+
+        self.routes = [
+            ("GET", r"/account", self.account_info),
+            ("GET", r"/regions", lambda request: self.page(request, "regions", REGIONS)),
+            ("GET", r"/sizes", lambda request: self.page(request, "sizes", SIZES)),
+            ("GET", r"/actions", self.action_list),
+            ("GET", r"/actions/(\d+)", self.action_info),
+            ("GET", r"/droplets", self.droplet_list),
+            ("POST", r"/droplets", self.droplet_create),
+            ("DELETE", r"/droplets", self.droplet_destroy_tag),
+            ("POST", r"/droplets/actions", self.droplet_action_tag),
+            ("GET", r"/droplets/(\d+)", self.droplet_info),
+            ("DELETE", r"/droplets/(\d+)", self.droplet_destroy),
+            ("POST", r"/droplets/(\d+)/actions", self.droplet_action),
+            ("GET", r"/droplets/(\d+)/actions", self.resource_action_list),
+            ("GET", r"/droplets/(\d+)/actions/(\d+)", self.resource_action_info),
+            ("GET", r"/droplets/(\d+)/kernels", self.droplet_kernel_list),
+            ("GET", r"/droplets/(\d+)/snapshots", self.droplet_snapshot_list),
+            ("GET", r"/droplets/(\d+)/backups", self.droplet_backup_list),
+            ("GET", r"/droplets/(\d+)/neighbors", self.droplet_neighbor_list),
+            ("GET", r"/reports/droplet_neighbors", self.droplet_neighbors),
+            ("GET", r"/volumes", self.volume_list),
+            ("POST", r"/volumes", self.volume_create),
+            ("DELETE", r"/volumes", self.volume_destroy_name),
+            ("POST", r"/volumes/actions", self.volume_action_name),
+            ("GET", r"/volumes/([\w-]+)", self.volume_info),
+            ("DELETE", r"/volumes/([\w-]+)", self.volume_destroy),
+            ("POST", r"/volumes/([\w-]+)/actions", self.volume_action),
+            ("GET", r"/volumes/([\w-]+)/actions", self.resource_action_list),
+            ("GET", r"/volumes/([\w-]+)/actions/(\d+)", self.resource_action_info),
+            ("GET", r"/volumes/([\w-]+)/snapshots", self.volume_snapshot_list),
+            ("POST", r"/volumes/([\w-]+)/snapshots", self.volume_snapshot_create),
+            ("GET", r"/images", self.image_list),
+            ("GET", r"/images/([\w-]+)", self.image_info),
+            ("PUT", r"/images/(\d+)", self.image_update),
+            ("DELETE", r"/images/(\d+)", self.image_destroy),
+            ("POST", r"/images/(\d+)/actions", self.image_action),
+            ("GET", r"/images/(\d+)/actions", self.resource_action_list),
+            ("GET", r"/images/(\d+)/actions/(\d+)", self.resource_action_info),
+            ("GET", r"/snapshots", self.snapshot_list),
+            ("GET", r"/snapshots/([\w-]+)", self.snapshot_info),
+            ("DELETE", r"/snapshots/([\w-]+)", self.snapshot_destroy),
+            ("GET", r"/domains", self.domain_list),
+            ("POST", r"/domains", self.domain_create),
+            ("GET", r"/domains/([\w.-]+)", self.domain_info),
+            ("DELETE", r"/domains/([\w.-]+)", self.domain_destroy),
+            ("GET", r"/domains/([\w.-]+)/records", self.record_list),
+            ("POST", r"/domains/([\w.-]+)/records", self.record_create),
+            ("GET", r"/domains/([\w.-]+)/records/(\d+)", self.record_info),
+            ("PUT", r"/domains/([\w.-]+)/records/(\d+)", self.record_update),
+            ("DELETE", r"/domains/([\w.-]+)/records/(\d+)", self.record_destroy),
+            ("GET", r"/tags", self.tag_list),
+            ("POST", r"/tags", self.tag_create),
+            ("GET", r"/tags/([\w:.-]+)", self.tag_info),
+            ("PUT", r"/tags/([\w:.-]+)", self.tag_update),
+            ("DELETE", r"/tags/([\w:.-]+)", self.tag_destroy),
+            ("POST", r"/tags/([\w:.-]+)/resources", self.tag_attach),
+            ("DELETE", r"/tags/([\w:.-]+)/resources", self.tag_detach),
+            ("GET", r"/load_balancers", self.load_balancer_list),
+            ("POST", r"/load_balancers", self.load_balancer_create),
+            ("GET", r"/load_balancers/([\w-]+)", self.load_balancer_info),
+            ("PUT", r"/load_balancers/([\w-]+)", self.load_balancer_update),
+            ("DELETE", r"/load_balancers/([\w-]+)", self.load_balancer_destroy),
+            ("POST", r"/load_balancers/([\w-]+)/droplets", self.load_balancer_droplet_add),
+            ("DELETE", r"/load_balancers/([\w-]+)/droplets", self.load_balancer_droplet_remove),
+            ("POST", r"/load_balancers/([\w-]+)/forwarding_rules", self.load_balancer_rule_add),
+            ("DELETE", r"/load_balancers/([\w-]+)/forwarding_rules",
+             self.load_balancer_rule_remove),
+            ("GET", r"/certificates", self.certificate_list),
+            ("POST", r"/certificates", self.certificate_create),
+            ("GET", r"/certificates/([\w-]+)", self.certificate_info),
+            ("DELETE", r"/certificates/([\w-]+)", self.certificate_destroy),
+            ("GET", r"/floating_ips", self.floating_ip_list),
+            ("POST", r"/floating_ips", self.floating_ip_create),
+            ("GET", r"/floating_ips/([\d.]+)", self.floating_ip_info),
+            ("DELETE", r"/floating_ips/([\d.]+)", self.floating_ip_destroy),
+            ("POST", r"/floating_ips/([\d.]+)/actions", self.floating_ip_action),
+            ("GET", r"/floating_ips/([\d.]+)/actions", self.resource_action_list),
+            ("GET", r"/floating_ips/([\d.]+)/actions/(\d+)", self.resource_action_info),
+            ("GET", r"/account/keys", self.ssh_key_list),
+            ("POST", r"/account/keys", self.ssh_key_create),
+            ("GET", r"/account/keys/([\w:]+)", self.ssh_key_info),
+            ("PUT", r"/account/keys/([\w:]+)", self.ssh_key_update),
+            ("DELETE", r"/account/keys/([\w:]+)", self.ssh_key_destroy),
+        ]
+
+        self.routes = [
+            (method, re.compile(r"^/v2%s/?$" % pattern), handler)
+            for (method, pattern, handler) in self.routes
+        ]
+
+    # Plumbing
+
+    @staticmethod
+    def now():
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def later(self, delay, change):
+        """
+        Schedules change to be applied once delay seconds have passed
+        """
+        self.pending.append((time.time() + delay, next(self.ids), change))
+
+    def advance(self):
+
+        now = time.time()
+        due = sorted(entry for entry in self.pending if entry[0] <= now)
+        self.pending = [entry for entry in self.pending if entry[0] > now]
+
+        for (when, order, change) in due:
+            change()
+
+    def limit(self):
+        """
+        Returns the rate limit headers, and whether this call is over the limit
+        """
+
+        now = time.time()
+
+        while self.calls and self.calls[0] <= now - self.window:
+            self.calls.popleft()
+
+        over = len(self.calls) >= self.rate_limit
+
+        if not over:
+            self.calls.append(now)
+
+        reset = self.calls[0] + self.window if self.calls else now + self.window
+
+        return ({
+            "RateLimit-Limit": str(self.rate_limit),
+            "RateLimit-Remaining": str(max(self.rate_limit - len(self.calls), 0)),
+            "RateLimit-Reset": str(int(reset))
+        }, over)
+
+    def handle(self, method, url, body, base):
+
+        parsed = urlparse(url)
+
+        request = {
+            "query": {name: values[-1] for (name, values) in parse_qs(parsed.query).items()},
+            "body": body or {},
+            "path": parsed.path,
+            "base": base,
+            "args": ()
+        }
+
+        with self.lock:
+
+            self.log.append({"time": time.time(), "method": method, "path": parsed.path})
+
+            (headers, over) = self.limit()
+
+            if over:
+                return (429, headers, {
+                    "id": "too_many_requests", "message": "API Rate limit exceeded."
+                })
+
+            self.advance()
+
+            for (route_method, pattern, handler) in self.routes:
+
+                if route_method != method:
+                    continue
+
+                match = pattern.match(parsed.path)
+
+                if match is None:
+                    continue
+
+                request["args"] = match.groups()
+
+                try:
+                    (status, result) = handler(request)
+                except NotFound:
+                    (status, result) = (404, NOT_FOUND)
+                except Invalid as exception:
+                    (status, result) = (422, {"id": "unprocessable_entity", "message": str(exception)})
+
+                return (status, headers, result)
+
+            return (404, headers, NOT_FOUND)
+
+    def page(self, request, key, items):
+        """
+        Pages a list like the API, with links and meta
+        """
+
+        try:
+            per_page = min(int(request["query"].get("per_page", PER_PAGE)), PER_PAGE_MAX)
+            page = max(int(request["query"].get("page", 1)), 1)
+        except ValueError:
+            raise Invalid("page and per_page must be numbers")
+
+        items = list(items)
+        last = max((len(items) + per_page - 1) // per_page, 1)
+
+        def link(number):
+            query = dict(request["query"], page=number, per_page=per_page)
+            return "%s%s?%s" % (request["base"], request["path"], urlencode(sorted(query.items())))
+
+        pages = {}
+
+        if page > 1:
+            pages["first"] = link(1)
+            pages["prev"] = link(page - 1)
+
+        if page < last:
+            pages["next"] = link(page + 1)
+            pages["last"] = link(last)
+
+        return (200, {
+            key: items[(page - 1) * per_page:page * per_page],
+            "links": {"pages": pages} if pages else {},
+            "meta": {"total": len(items)}
+        })
+
+    def find(self, collection, key):
+
+        for (item_id, item) in collection.items():
+            if str(item_id) == str(key):
+                return item
+
+        raise NotFound()
+
+    def action(self, type, resource_type, resource_id, region=None, delay=None, effect=None):
+        """
+        Creates an in-progress action that completes, applying effect, after delay seconds
+        """
+
+        action_id = next(self.ids)
+
+        action = {
+            "id": action_id, "status": "in-progress", "type": type,
+            "started_at": self.now(), "completed_at": None,
+            "resource_id": resource_id, "resource_type": resource_type,
+            "region": region, "region_slug": region["slug"] if region else None
+        }
+
+        self.actions[action_id] = action
+
+        def complete():
+            action["status"] = "completed"
+            action["completed_at"] = self.now()
+            if effect is not None:
+                effect()
+
+        self.later(self.action_delay if delay is None else delay, complete)
+
+        return action
+
+    # Account, Actions
+
+    def account_info(self, request):
+        return (200, {"account": {
+            "uuid": "b60c5d2212bf79e1a2bb0e3c1b2ae30a617fb796", "email": "doboto@example.com",
+            "droplet_limit": 25, "floating_ip_limit": 3, "email_verified": True,
+            "status": "active", "status_message": ""
+        }})
+
+    def action_list(self, request):
+        return self.page(request, "actions", reversed(list(self.actions.values())))
+
+    def action_info(self, request):
+        return (200, {"action": self.find(self.actions, request["args"][0])})
+
+    def resource_action_list(self, request):
+        return self.page(request, "actions", [
+            action for action in reversed(list(self.actions.values()))
+            if str(action["resource_id"]) == request["args"][0]
+        ])
+
+    def resource_action_info(self, request):
+        action = self.find(self.actions, request["args"][1])
+        if str(action["resource_id"]) != request["args"][0]:
+            raise NotFound()
+        return (200, {"action": action})
+
+    # Droplets
+
+    def droplet_list(self, request):
+        return self.page(request, "droplets", [
+            droplet for droplet in self.droplets.values()
+            if "tag_name" not in request["query"] or request["query"]["tag_name"] in droplet["tags"]
+        ])
+
+    def droplet_new(self, name, attribs):
+
+        region = self.find({region["slug"]: region for region in REGIONS}, attribs.get("region"))
+        size = self.find({size["slug"]: size for size in SIZES}, attribs.get("size"))
+        image = self.image_find(attribs.get("image"))
+
+        droplet_id = next(self.ids)
+
+        droplet = {
+            "id": droplet_id, "name": name, "memory": size["memory"], "vcpus": size["vcpus"],
+            "disk": size["disk"], "locked": False, "status": "new", "created_at": self.now(),
+            "features": [], "backup_ids": [], "snapshot_ids": [], "next_backup_window": None,
+            "image": image, "size": size, "size_slug": size["slug"], "region": region,
+            "kernel": {"id": 944, "name": "Debian 7 x64", "version": "3.2.0-4-amd64"},
+            "networks": {"v4": [], "v6": []},
+            "tags": list(attribs.get("tags") or []),
+            "volume_ids": list(attribs.get("volume") or [])
+        }
+
+        for tag in droplet["tags"]:
+            self.tag_ensure(tag)
+
+        if attribs.get("backups"):
+            droplet["features"].append("backups")
+
+        self.droplets[droplet_id] = droplet
+
+        def boot():
+            droplet["status"] = "active"
+            droplet["networks"]["v4"].append({
+                "ip_address": "10.%d.%d.%d" % (droplet_id % 250, droplet_id // 250 % 250, 10),
+                "netmask": "255.255.240.0", "gateway": "10.0.0.1", "type": "public"
+            })
+            if attribs.get("private_networking"):
+                droplet["features"].append("private_networking")
+                droplet["networks"]["v4"].append({
+                    "ip_address": "10.128.%d.%d" % (droplet_id // 250 % 250, droplet_id % 250),
+                    "netmask": "255.255.0.0", "gateway": "10.128.0.1", "type": "private"
+                })
+            if attribs.get("ipv6"):
+                droplet["features"].append("ipv6")
+                droplet["networks"]["v6"].append({
+                    "ip_address": "2604:a880::%x" % droplet_id, "netmask": 64,
+                    "gateway": "2604:a880::1", "type": "public"
+                })
+
+        self.action("create", "droplet", droplet_id, region, self.create_delay, boot)
+
+        return droplet
+
+    def droplet_create(self, request):
+
+        body = request["body"]
+
+        if "names" in body:
+            if len(body["names"]) > 10:
+                raise Invalid("you may only create up to 10 droplets at once")
+            return (202, {"droplets": [self.droplet_new(name, body) for name in body["names"]]})
+
+        if "name" in body:
+            return (202, {"droplet": self.droplet_new(body["name"], body)})
+
+        raise Invalid("name or names is required")
+
+    def droplet_info(self, request):
+        return (200, {"droplet": self.find(self.droplets, request["args"][0])})
+
+    def droplet_destroy(self, request):
+        droplet = self.find(self.droplets, request["args"][0])
+        del self.droplets[droplet["id"]]
+        for load_balancer in self.load_balancers.values():
+            if droplet["id"] in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].remove(droplet["id"])
+        return (204, None)
+
+    def droplet_destroy_tag(self, request):
+
+        if "tag_name" not in request["query"]:
+            raise NotFound()
+
+        for droplet in list(self.droplets.values()):
+            if request["query"]["tag_name"] in droplet["tags"]:
+                del self.droplets[droplet["id"]]
+
+        return (204, None)
+
+    def droplet_effect(self, droplet, body):
+        """
+        Returns what an action does to a droplet once it completes
+        """
+
+        def status(value):
+            def effect():
+                droplet["status"] = value
+            return effect
+
+        def snapshot():
+            image_id = next(self.ids)
+            image = {
+                "id": image_id, "name": body.get("name") or "%s-snapshot" % droplet["name"],
+                "distribution": droplet["image"]["distribution"], "slug": None,
+                "public": False, "regions": [droplet["region"]["slug"]], "type": "snapshot",
+                "min_disk_size": droplet["disk"], "size_gigabytes": 1.2,
+                "created_at": self.now()
+            }
+            self.images[image_id] = image
+            self.snapshots[str(image_id)] = {
+                "id": str(image_id), "name": image["name"], "regions": image["regions"],
+                "created_at": image["created_at"], "resource_id": str(droplet["id"]),
+                "resource_type": "droplet", "min_disk_size": image["min_disk_size"],
+                "size_gigabytes": image["size_gigabytes"]
+            }
+            droplet["snapshot_ids"].append(image_id)
+
+        def resize():
+            size = self.find({size["slug"]: size for size in SIZES}, body.get("size"))
+            droplet["size"] = size
+            droplet["size_slug"] = size["slug"]
+            droplet["memory"] = size["memory"]
+            droplet["vcpus"] = size["vcpus"]
+            if body.get("disk"):
+                droplet["disk"] = size["disk"]
+
+        def rename():
+            droplet["name"] = body.get("name")
+
+        def rebuild():
+            droplet["image"] = self.image_find(body.get("image"))
+
+        def feature(name, add=True):
+            def effect():
+                if add and name not in droplet["features"]:
+                    droplet["features"].append(name)
+                elif not add and name in droplet["features"]:
+                    droplet["features"].remove(name)
+            return effect
+
+        return {
+            "power_off": status("off"),
+            "shutdown": status("off"),
+            "power_on": status("active"),
+            "power_cycle": status("active"),
+            "reboot": status("active"),
+            "snapshot": snapshot,
+            "resize": resize,
+            "rename": rename,
+            "rebuild": rebuild,
+            "restore": rebuild,
+            "enable_backups": feature("backups"),
+            "disable_backups": feature("backups", False),
+            "enable_ipv6": feature("ipv6"),
+            "enable_private_networking": feature("private_networking"),
+        }.get(body.get("type"))
+
+    def droplet_action(self, request):
+
+        droplet = self.find(self.droplets, request["args"][0])
+
+        if "type" not in request["body"]:
+            raise Invalid("type is required")
+
+        return (201, {"action": self.action(
+            request["body"]["type"], "droplet", droplet["id"], droplet["region"],
+            effect=self.droplet_effect(droplet, request["body"])
+        )})
+
+    def droplet_action_tag(self, request):
+
+        if "tag_name" not in request["query"] or "type" not in request["body"]:
+            raise Invalid("tag_name and type are required")
+
+        return (201, {"actions": [
+            self.action(
+                request["body"]["type"], "droplet", droplet["id"], droplet["region"],
+                effect=self.droplet_effect(droplet, request["body"])
+            )
+            for droplet in self.droplets.values()
+            if request["query"]["tag_name"] in droplet["tags"]
+        ]})
+
+    def droplet_kernel_list(self, request):
+        self.find(self.droplets, request["args"][0])
+        return self.page(request, "kernels", [
+            {"id": 900 + index, "name": "Kernel %d" % index, "version": "4.4.0-%d-generic" % index}
+            for index in range(60)
+        ])
+
+    def droplet_snapshot_list(self, request):
+        droplet = self.find(self.droplets, request["args"][0])
+        return self.page(request, "snapshots", [
+            self.images[image_id] for image_id in droplet["snapshot_ids"]
+            if image_id in self.images
+        ])
+
+    def droplet_backup_list(self, request):
+        self.find(self.droplets, request["args"][0])
+        return self.page(request, "backups", [])
+
+    def droplet_neighbor_list(self, request):
+        self.find(self.droplets, request["args"][0])
+        return self.page(request, "droplets", [])
+
+    def droplet_neighbors(self, request):
+        return self.page(request, "neighbors", [])
+
+    # Volumes
+
+    def volume_list(self, request):
+        return self.page(request, "volumes", [
+            volume for volume in self.volumes.values()
+            if ("region" not in request["query"] or
+                volume["region"]["slug"] == request["query"]["region"]) and
+               ("name" not in request["query"] or volume["name"] == request["query"]["name"])
+        ])
+
+    def volume_create(self, request):
+
+        body = request["body"]
+
+        if "snapshot_id" in body:
+            region = self.find(
+                {region["slug"]: region for region in REGIONS},
+                self.find(self.snapshots, body["snapshot_id"])["regions"][0]
+            )
+        else:
+            region = self.find({region["slug"]: region for region in REGIONS}, body.get("region"))
+
+        volume_id = "%08x-0000-4000-8000-%012x" % (random.getrandbits(32), next(self.ids))
+
+        volume = {
+            "id": volume_id, "region": region, "droplet_ids": [], "name": body.get("name"),
+            "description": body.get("description") or "",
+            "size_gigabytes": int(body.get("size_gigabytes") or 1), "created_at": self.now()
+        }
+
+        self.volumes[volume_id] = volume
+
+        return (201, {"volume": volume})
+
+    def volume_named(self, name, region):
+
+        for volume in self.volumes.values():
+            if volume["name"] == name and volume["region"]["slug"] == region:
+                return volume
+
+        raise NotFound()
+
+    def volume_info(self, request):
+        return (200, {"volume": self.find(self.volumes, request["args"][0])})
+
+    def volume_destroy(self, request):
+        volume = self.find(self.volumes, request["args"][0])
+        del self.volumes[volume["id"]]
+        return (204, None)
+
+    def volume_destroy_name(self, request):
+        volume = self.volume_named(request["query"].get("name"), request["query"].get("region"))
+        del self.volumes[volume["id"]]
+        return (204, None)
+
+    def volume_act(self, volume, body):
+
+        droplet_id = body.get("droplet_id")
+
+        def attach():
+            if int(droplet_id) not in volume["droplet_ids"]:
+                volume["droplet_ids"].append(int(droplet_id))
+
+        def detach():
+            if int(droplet_id) in volume["droplet_ids"]:
+                volume["droplet_ids"].remove(int(droplet_id))
+
+        def resize():
+            volume["size_gigabytes"] = int(body.get("size_gigabytes"))
+
+        (type, effect) = {
+            "attach": ("attach_volume", attach),
+            "detach": ("detach_volume", detach),
+            "resize": ("resize_volume", resize)
+        }[body.get("type")]
+
+        return (202, {"action": self.action(
+            type, "volume", volume["id"], volume["region"], effect=effect
+        )})
+
+    def volume_action(self, request):
+        return self.volume_act(self.find(self.volumes, request["args"][0]), request["body"])
+
+    def volume_action_name(self, request):
+        volume = self.volume_named(request["body"].get("volume_name"), request["body"].get("region"))
+        return self.volume_act(volume, request["body"])
+
+    def volume_snapshot_list(self, request):
+        self.find(self.volumes, request["args"][0])
+        return self.page(request, "snapshots", [
+            snapshot for snapshot in self.snapshots.values()
+            if snapshot["resource_id"] == request["args"][0]
+        ])
+
+    def volume_snapshot_create(self, request):
+
+        volume = self.find(self.volumes, request["args"][0])
+
+        snapshot_id = "%08x-0000-4000-8000-%012x" % (random.getrandbits(32), next(self.ids))
+
+        snapshot = {
+            "id": snapshot_id, "name": request["body"].get("name"),
+            "regions": [volume["region"]["slug"]], "created_at": self.now(),
+            "resource_id": volume["id"], "resource_type": "volume",
+            "min_disk_size": volume["size_gigabytes"], "size_gigabytes": 0
+        }
+
+        self.snapshots[snapshot_id] = snapshot
+
+        return (201, {"snapshot": snapshot})
+
+    # Images, Snapshots
+
+    def image_find(self, key):
+
+        for image in self.images.values():
+            if str(image["id"]) == str(key) or image["slug"] == key:
+                return image
+
+        raise NotFound()
+
+    def image_list(self, request):
+
+        images = list(self.images.values())
+
+        if request["query"].get("private") == "true":
+            images = [image for image in images if not image["public"]]
+
+        if request["query"].get("type") == "distribution":
+            images = [image for image in images if image["public"]]
+        elif request["query"].get("type") == "application":
+            images = []
+
+        return self.page(request, "images", images)
+
+    def image_info(self, request):
+        return (200, {"image": self.image_find(request["args"][0])})
+
+    def image_update(self, request):
+        image = self.find(self.images, request["args"][0])
+        image["name"] = request["body"].get("name", image["name"])
+        return (200, {"image": image})
+
+    def image_destroy(self, request):
+        image = self.find(self.images, request["args"][0])
+        del self.images[image["id"]]
+        self.snapshots.pop(str(image["id"]), None)
+        return (204, None)
+
+    def image_action(self, request):
+
+        image = self.find(self.images, request["args"][0])
+        body = request["body"]
+
+        def transfer():
+            if body.get("region") not in image["regions"]:
+                image["regions"].append(body.get("region"))
+
+        def convert():
+            image["type"] = "snapshot"
+
+        effect = {"transfer": transfer, "convert": convert}.get(body.get("type"))
+
+        if effect is None:
+            raise Invalid("type must be transfer or convert")
+
+        return (201, {"action": self.action(body["type"], "image", image["id"], effect=effect)})
+
+    def snapshot_list(self, request):
+        return self.page(request, "snapshots", [
+            snapshot for snapshot in self.snapshots.values()
+            if "resource_type" not in request["query"] or
+               snapshot["resource_type"] == request["query"]["resource_type"]
+        ])
+
+    def snapshot_info(self, request):
+        return (200, {"snapshot": self.find(self.snapshots, request["args"][0])})
+
+    def snapshot_destroy(self, request):
+        snapshot = self.find(self.snapshots, request["args"][0])
+        del self.snapshots[snapshot["id"]]
+        self.images.pop(int(snapshot["id"]) if snapshot["id"].isdigit() else None, None)
+        return (204, None)
+
+    # Domains
+
+    def domain_list(self, request):
+        return self.page(request, "domains", self.domains.values())
+
+    def domain_create(self, request):
+
+        name = request["body"].get("name")
+
+        if not name or name in self.domains:
+            raise Invalid("name is missing or already in use")
+
+        self.domains[name] = {"name": name, "ttl": 1800, "zone_file": ""}
+        self.records[name] = collections.OrderedDict()
+
+        for (type, data) in [
+            ("NS", "ns1.digitalocean.com"), ("NS", "ns2.digitalocean.com"),
+            ("NS", "ns3.digitalocean.com"), ("A", request["body"].get("ip_address"))
+        ]:
+            self.record_new(name, {"type": type, "name": "@", "data": data})
+
+        return (201, {"domain": self.domains[name]})
+
+    def domain_info(self, request):
+        return (200, {"domain": self.find(self.domains, request["args"][0])})
+
+    def domain_destroy(self, request):
+        domain = self.find(self.domains, request["args"][0])
+        del self.domains[domain["name"]]
+        del self.records[domain["name"]]
+        return (204, None)
+
+    def record_new(self, domain, attribs):
+
+        record_id = next(self.ids)
+
+        record = {
+            "id": record_id, "type": attribs.get("type"), "name": attribs.get("name"),
+            "data": attribs.get("data"), "priority": attribs.get("priority"),
+            "port": attribs.get("port"), "ttl": attribs.get("ttl", 1800),
+            "weight": attribs.get("weight"), "flags": attribs.get("flags"),
+            "tag": attribs.get("tag")
+        }
+
+        self.records[domain][record_id] = record
+
+        return record
+
+    def record_list(self, request):
+        self.find(self.domains, request["args"][0])
+        return self.page(request, "domain_records", self.records[request["args"][0]].values())
+
+    def record_create(self, request):
+        self.find(self.domains, request["args"][0])
+        if not request["body"].get("type"):
+            raise Invalid("type is required")
+        return (201, {"domain_record": self.record_new(request["args"][0], request["body"])})
+
+    def record_info(self, request):
+        self.find(self.domains, request["args"][0])
+        return (200, {"domain_record": self.find(
+            self.records[request["args"][0]], request["args"][1]
+        )})
+
+    def record_update(self, request):
+        self.find(self.domains, request["args"][0])
+        record = self.find(self.records[request["args"][0]], request["args"][1])
+        for field in ["type", "name", "data", "priority", "port", "ttl", "weight", "flags", "tag"]:
+            if field in request["body"]:
+                record[field] = request["body"][field]
+        return (200, {"domain_record": record})
+
+    def record_destroy(self, request):
+        self.find(self.domains, request["args"][0])
+        record = self.find(self.records[request["args"][0]], request["args"][1])
+        del self.records[request["args"][0]][record["id"]]
+        return (204, None)
+
+    # Tags
+
+    def tag_ensure(self, name):
+        if name not in self.tags:
+            self.tags[name] = {"name": name}
+
+    def tag_collections(self):
+        """
+        Returns each taggable resource type with its key in tag resources, path and collection
+        """
+
+        return [
+            ("droplet", "droplets", "droplets", self.droplets),
+            ("image", "images", "images", self.images),
+            ("volume", "volumes", "volumes", self.volumes),
+            ("volume_snapshot", "volume_snapshots", "snapshots", collections.OrderedDict(
+                (snapshot_id, snapshot) for (snapshot_id, snapshot) in self.snapshots.items()
+                if snapshot.get("resource_type") == "volume"
+            ))
+        ]
+
+    def tag_render(self, request, name):
+
+        resources = {"count": 0, "last_tagged_uri": ""}
+
+        for (resource_type, key, path, collection) in self.tag_collections():
+
+            tagged = [item for item in collection.values() if name in (item.get("tags") or [])]
+
+            resources[key] = {
+                "count": len(tagged),
+                "last_tagged_uri": "%s/v2/%s/%s" % (
+                    request["base"], path, tagged[-1]["id"]
+                ) if tagged else ""
+            }
+
+            if resource_type == "droplet":
+                resources[key]["last_tagged"] = tagged[-1] if tagged else None
+
+            resources["count"] += len(tagged)
+
+            if tagged:
+                resources["last_tagged_uri"] = resources[key]["last_tagged_uri"]
+
+        return {"name": name, "resources": resources}
+
+    def tag_list(self, request):
+        return self.page(request, "tags", [self.tag_render(request, name) for name in self.tags])
+
+    def tag_create(self, request):
+        name = request["body"].get("name")
+        if not name:
+            raise Invalid("name is required")
+        self.tag_ensure(name)
+        return (201, {"tag": self.tag_render(request, name)})
+
+    def tag_info(self, request):
+        self.find(self.tags, request["args"][0])
+        return (200, {"tag": self.tag_render(request, request["args"][0])})
+
+    def tag_update(self, request):
+
+        name = request["args"][0]
+        new_name = request["body"].get("name")
+
+        self.find(self.tags, name)
+
+        del self.tags[name]
+        self.tag_ensure(new_name)
+
+        for (resource_type, key, path, collection) in self.tag_collections():
+            for item in collection.values():
+                if name in (item.get("tags") or []):
+                    item["tags"][item["tags"].index(name)] = new_name
+
+        return (200, {"tag": self.tag_render(request, new_name)})
+
+    def tag_destroy(self, request):
+
+        self.find(self.tags, request["args"][0])
+        del self.tags[request["args"][0]]
+
+        for (resource_type, key, path, collection) in self.tag_collections():
+            for item in collection.values():
+                if request["args"][0] in (item.get("tags") or []):
+                    item["tags"].remove(request["args"][0])
+
+        return (204, None)
+
+    def tag_resources(self, request):
+
+        self.find(self.tags, request["args"][0])
+
+        resources = request["body"].get("resources") or []
+
+        if not resources:
+            raise Invalid("resources is required")
+
+        taggable = dict(
+            (resource_type, collection)
+            for (resource_type, key, path, collection) in self.tag_collections()
+        )
+
+        for resource in resources:
+            if resource.get("resource_type") not in taggable:
+                raise Invalid("resource_type %s can't be tagged" % resource.get("resource_type"))
+
+        return [
+            self.find(taggable[resource["resource_type"]], resource["resource_id"])
+            for resource in resources
+        ]
+
+    def tag_attach(self, request):
+
+        for item in self.tag_resources(request):
+            if request["args"][0] not in item.setdefault("tags", []):
+                item["tags"].append(request["args"][0])
+
+        return (204, None)
+
+    def tag_detach(self, request):
+
+        for item in self.tag_resources(request):
+            if request["args"][0] in (item.get("tags") or []):
+                item["tags"].remove(request["args"][0])
+
+        return (204, None)
+
+    # Load Balancers
+
+    def load_balancer_settle(self, load_balancer):
+        """
+        Load balancers go back to new while being reconfigured and become active again later
+        """
+
+        load_balancer["status"] = "new"
+
+        def activate():
+            load_balancer["status"] = "active"
+            if not load_balancer["ip"]:
+                load_balancer["ip"] = "45.55.%d.%d" % (
+                    len(self.load_balancers) % 250, random.randint(1, 250)
+                )
+
+        self.later(self.action_delay, activate)
+
+    def load_balancer_apply(self, load_balancer, body):
+
+        load_balancer["name"] = body.get("name", load_balancer["name"])
+        load_balancer["algorithm"] = body.get("algorithm") or "round_robin"
+        load_balancer["forwarding_rules"] = body.get("forwarding_rules") or []
+        load_balancer["health_check"] = body.get("health_check") or {
+            "protocol": "http", "port": 80, "path": "/", "check_interval_seconds": 10,
+            "response_timeout_seconds": 5, "healthy_threshold": 5, "unhealthy_threshold": 3
+        }
+        load_balancer["sticky_sessions"] = body.get("sticky_sessions") or {"type": "none"}
+        load_balancer["redirect_http_to_https"] = bool(body.get("redirect_http_to_https"))
+        load_balancer["tag"] = body.get("tag") or ""
+        load_balancer["droplet_ids"] = [
+            int(droplet_id) for droplet_id in body.get("droplet_ids") or []
+        ]
+
+        if load_balancer["tag"]:
+            load_balancer["droplet_ids"] = [
+                droplet["id"] for droplet in self.droplets.values()
+                if load_balancer["tag"] in droplet["tags"]
+            ]
+
+    def load_balancer_list(self, request):
+        return self.page(request, "load_balancers", self.load_balancers.values())
+
+    def load_balancer_create(self, request):
+
+        body = request["body"]
+
+        if not body.get("name") or not body.get("forwarding_rules"):
+            raise Invalid("name and forwarding_rules are required")
+
+        load_balancer_id = "%08x-0000-4000-8000-%012x" % (random.getrandbits(32), next(self.ids))
+
+        load_balancer = {
+            "id": load_balancer_id, "name": body["name"], "ip": "", "status": "new",
+            "created_at": self.now(),
+            "region": self.find({region["slug"]: region for region in REGIONS}, body.get("region"))
+        }
+
+        self.load_balancer_apply(load_balancer, body)
+        self.load_balancers[load_balancer_id] = load_balancer
+
+        def activate():
+            load_balancer["status"] = "active"
+            load_balancer["ip"] = "45.55.%d.%d" % (
+                len(self.load_balancers) % 250, random.randint(1, 250)
+            )
+
+        self.later(self.create_delay, activate)
+
+        return (202, {"load_balancer": load_balancer})
+
+    def load_balancer_info(self, request):
+        return (200, {"load_balancer": self.find(self.load_balancers, request["args"][0])})
+
+    def load_balancer_update(self, request):
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+        self.load_balancer_apply(load_balancer, request["body"])
+        self.load_balancer_settle(load_balancer)
+        return (200, {"load_balancer": load_balancer})
+
+    def load_balancer_destroy(self, request):
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+        del self.load_balancers[load_balancer["id"]]
+        return (204, None)
+
+    def load_balancer_droplet_add(self, request):
+
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+
+        if load_balancer["tag"]:
+            raise Invalid("droplets cannot be added to a load balancer using a tag")
+
+        for droplet_id in request["body"].get("droplet_ids") or []:
+            self.find(self.droplets, droplet_id)
+            if int(droplet_id) not in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].append(int(droplet_id))
+
+        self.load_balancer_settle(load_balancer)
+
+        return (204, None)
+
+    def load_balancer_droplet_remove(self, request):
+
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+
+        for droplet_id in request["body"].get("droplet_ids") or []:
+            if int(droplet_id) in load_balancer["droplet_ids"]:
+                load_balancer["droplet_ids"].remove(int(droplet_id))
+
+        self.load_balancer_settle(load_balancer)
+
+        return (204, None)
+
+    def load_balancer_rule_add(self, request):
+
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+
+        for rule in request["body"].get("forwarding_rules") or []:
+            if rule not in load_balancer["forwarding_rules"]:
+                load_balancer["forwarding_rules"].append(rule)
+
+        self.load_balancer_settle(load_balancer)
+
+        return (204, None)
+
+    def load_balancer_rule_remove(self, request):
+
+        load_balancer = self.find(self.load_balancers, request["args"][0])
+
+        remove = request["body"].get("forwarding_rules") or []
+
+        load_balancer["forwarding_rules"] = [
+            rule for rule in load_balancer["forwarding_rules"]
+            if not any(all(rule.get(key) == value for (key, value) in removing.items())
+                       for removing in remove)
+        ]
+
+        self.load_balancer_settle(load_balancer)
+
+        return (204, None)
+
+    # Certificates
+
+    def certificate_list(self, request):
+        return self.page(request, "certificates", self.certificates.values())
+
+    def certificate_create(self, request):
+
+        body = request["body"]
+
+        if not body.get("name") or not body.get("leaf_certificate"):
+            raise Invalid("name and leaf_certificate are required")
+
+        certificate_id = "%08x-0000-4000-8000-%012x" % (random.getrandbits(32), next(self.ids))
+
+        certificate = {
+            "id": certificate_id, "name": body["name"], "not_after": "2027-01-01T00:00:00Z",
+            "sha1_fingerprint": hashlib.sha1(body["leaf_certificate"].encode('utf-8')).hexdigest(),
+            "created_at": self.now()
+        }
+
+        self.certificates[certificate_id] = certificate
+
+        return (201, {"certificate": certificate})
+
+    def certificate_info(self, request):
+        return (200, {"certificate": self.find(self.certificates, request["args"][0])})
+
+    def certificate_destroy(self, request):
+        certificate = self.find(self.certificates, request["args"][0])
+        del self.certificates[certificate["id"]]
+        return (204, None)
+
+    # Floating IPs
+
+    def floating_ip_list(self, request):
+        return self.page(request, "floating_ips", self.floating_ips.values())
+
+    def floating_ip_create(self, request):
+
+        body = request["body"]
+
+        droplet = None
+
+        if body.get("droplet_id") is not None:
+            droplet = self.find(self.droplets, body["droplet_id"])
+            region = droplet["region"]
+        else:
+            region = self.find({region["slug"]: region for region in REGIONS}, body.get("region"))
+
+        ip = "45.55.%d.%d" % (next(self.ids) // 250 % 250, next(self.ids) % 250)
+
+        floating_ip = {"ip": ip, "region": region, "droplet": None}
+
+        self.floating_ips[ip] = floating_ip
+
+        if droplet is not None:
+
+            def assign():
+                floating_ip["droplet"] = droplet
+
+            self.action("assign_ip", "floating_ip", ip, region, effect=assign)
+
+        return (202, {"floating_ip": floating_ip})
+
+    def floating_ip_info(self, request):
+        return (200, {"floating_ip": self.find(self.floating_ips, request["args"][0])})
+
+    def floating_ip_destroy(self, request):
+        floating_ip = self.find(self.floating_ips, request["args"][0])
+        del self.floating_ips[floating_ip["ip"]]
+        return (204, None)
+
+    def floating_ip_action(self, request):
+
+        floating_ip = self.find(self.floating_ips, request["args"][0])
+        body = request["body"]
+
+        if body.get("type") == "assign":
+
+            droplet = self.find(self.droplets, body.get("droplet_id"))
+
+            def effect():
+                floating_ip["droplet"] = droplet
+
+            type = "assign_ip"
+
+        elif body.get("type") == "unassign":
+
+            def effect():
+                floating_ip["droplet"] = None
+
+            type = "unassign_ip"
+
+        else:
+            raise Invalid("type must be assign or unassign")
+
+        return (201, {"action": self.action(
+            type, "floating_ip", floating_ip["ip"], floating_ip["region"], effect=effect
+        )})
+
+    # SSH Keys
+
+    def ssh_key_list(self, request):
+        return self.page(request, "ssh_keys", self.ssh_keys.values())
+
+    def ssh_key_find(self, key):
+
+        for ssh_key in self.ssh_keys.values():
+            if str(ssh_key["id"]) == key or ssh_key["fingerprint"] == key:
+                return ssh_key
+
+        raise NotFound()
+
+    def ssh_key_create(self, request):
+
+        body = request["body"]
+
+        if not body.get("name") or not body.get("public_key"):
+            raise Invalid("name and public_key are required")
+
+        digest = hashlib.md5(body["public_key"].encode('utf-8')).hexdigest()
+
+        ssh_key = {
+            "id": next(self.ids), "name": body["name"], "public_key": body["public_key"],
+            "fingerprint": ":".join(digest[index:index + 2] for index in range(0, 32, 2))
+        }
+
+        self.ssh_keys[ssh_key["id"]] = ssh_key
+
+        return (201, {"ssh_key": ssh_key})
+
+    def ssh_key_info(self, request):
+        return (200, {"ssh_key": self.ssh_key_find(request["args"][0])})
+
+    def ssh_key_update(self, request):
+        ssh_key = self.ssh_key_find(request["args"][0])
+        ssh_key["name"] = request["body"].get("name", ssh_key["name"])
+        return (200, {"ssh_key": ssh_key})
+
+    def ssh_key_destroy(self, request):
+        ssh_key = self.ssh_key_find(request["args"][0])
+        del self.ssh_keys[ssh_key["id"]]
+        return (204, None)
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def respond(self, status, headers, result):
+
+        body = b"" if result is None else json.dumps(result).encode('utf-8')
+
+        if self.command == "GET" and status == 200:
+
+            headers = dict(headers, ETag='W/"%s"' % hashlib.sha1(body).hexdigest())
+
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                (status, body) = (304, b"")
+
+        self.send_response(status)
+
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def dispatch(self):
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        try:
+            body = json.loads(body.decode('utf-8')) if body else None
+        except ValueError:
+            body = None
+
+        if self.path.startswith("/_stats"):
+            with self.server.api.lock:
+                if self.command == "DELETE":
+                    del self.server.api.log[:]
+                return self.respond(200, {}, {"requests": self.server.api.log})
+
+        base = "http://%s" % self.headers.get("Host", "%s:%s" % self.server.server_address)
+
+        self.respond(*self.server.api.handle(self.command, self.path, body, base))
+
+    do_GET = do_POST = do_PUT = do_DELETE = dispatch
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, api, verbose=False):
+        HTTPServer.__init__(self, address, Handler)
+        self.api = api
+        self.verbose = verbose
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the DigitalOcean v2 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8080, type=int)
+    parser.add_argument("--action-delay", default=2.0, type=float,
+                        help="seconds before actions complete")
+    parser.add_argument("--create-delay", default=3.0, type=float,
+                        help="seconds before droplets and load balancers become active")
+    parser.add_argument("--rate-limit", default=5000, type=int,
+                        help="requests allowed per rate limit window")
+    parser.add_argument("--window", default=3600, type=int,
+                        help="seconds in the rate limit window")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    api = API(args.action_delay, args.create_delay, args.rate_limit, args.window)
+    server = Server((args.host, args.port), api, args.verbose)
+
+    print("Serving the DigitalOcean API on http://%s:%s/v2" % server.server_address)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()